@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Manifest of the thumbnail assets in SEQUENCE_DIR.
+
+One scandir pass over sequence/ (<N>.jpg) and sequence/sources/ (<N>.png)
+gives name, mtime and size of every file. Only new or changed files are
+probed further: dimensions from the header (thumbnail_image.read_image_size)
+and, on request, a content hash. The result is saved compactly in
+runtime/asset_manifest.json, so the next refresh costs one scandir.
+
+Per-day questions ("which days in 1..1000 have no valid 16:9 JPG") are
+answered with integer bitsets: bit N is set when day N has the asset.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from mtm_content import SEQUENCE_DIR
+from thumbnail_image import is_close_to_16_9, read_image_size
+
+RUNTIME_DIR = Path(__file__).resolve().parent / "runtime"
+ASSET_MANIFEST_FILE = RUNTIME_DIR / "asset_manifest.json"
+MANIFEST_VERSION = 1
+
+SOURCES_DIR = SEQUENCE_DIR / "sources"
+DAY_FILE_PATTERN = re.compile(r"^(\d+)\.(png|jpg)$", re.IGNORECASE)
+
+TOTAL_DAYS = 1000
+
+
+class AssetRecord(NamedTuple):
+    mtime_ns: int
+    size: int
+    width: int
+    height: int
+    hash: Optional[str] = None
+    # Для JPG: хэш PNG, из которого он собран (см. utils/check_missing_jpgs.py)
+    source_hash: Optional[str] = None
+
+    @property
+    def is_16x9(self) -> bool:
+        return is_close_to_16_9(self.width, self.height)
+
+
+def content_hash(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def iter_days(bits: int) -> Iterator[int]:
+    """Номера дней, чьи биты выставлены, по возрастанию."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def day_range_bits(first: int, last: int) -> int:
+    return ((1 << (last + 1)) - 1) ^ ((1 << first) - 1)
+
+
+class AssetManifest:
+    """
+    Записи по ключу "<N>.jpg" (sequence/) и "sources/<N>.png".
+    refresh() сверяет их с диском; save() пишет файл, если что-то изменилось.
+    """
+
+    def __init__(self, path: Path = ASSET_MANIFEST_FILE) -> None:
+        self.path = path
+        self.records: Dict[str, AssetRecord] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return
+        try:
+            self.records = {key: AssetRecord(*row) for key, row in data["files"].items()}
+        except (AttributeError, KeyError, TypeError):
+            # Битый файл — как файл другой версии: пустой манифест, refresh() соберёт заново
+            self.records = {}
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        payload = {
+            "version": MANIFEST_VERSION,
+            "files": {key: list(record) for key, record in sorted(self.records.items())},
+        }
+        tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    @staticmethod
+    def file_path(key: str) -> Path:
+        return SEQUENCE_DIR / key
+
+    def refresh(self, hash_kinds: Iterable[str] = ()) -> List[str]:
+        """
+        Сверяет записи с диском: один scandir на каталог, заголовки читаются
+        только у новых/изменённых файлов. hash_kinds ("png", "jpg") — для
+        каких файлов досчитать хэш содержимого, где его ещё нет.
+        Возвращает ключи добавленных, изменённых и удалённых записей.
+        """
+        hash_kinds = set(hash_kinds)
+        seen = set()
+        updated = []
+        for directory, prefix, ext in ((SEQUENCE_DIR, "", "jpg"), (SOURCES_DIR, "sources/", "png")):
+            try:
+                entries = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    match = DAY_FILE_PATTERN.match(entry.name)
+                    if not match or match.group(2).lower() != ext:
+                        continue
+                    key = prefix + entry.name
+                    seen.add(key)
+                    if self._update(key, entry, ext in hash_kinds):
+                        updated.append(key)
+
+        for key in set(self.records) - seen:
+            del self.records[key]
+            updated.append(key)
+        if updated:
+            self._dirty = True
+        return updated
+
+    def _update(self, key: str, entry: os.DirEntry, with_hash: bool) -> bool:
+        st = entry.stat()
+        old = self.records.get(key)
+        if old is not None and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+            if with_hash and old.hash is None:
+                self.records[key] = old._replace(hash=content_hash(Path(entry.path)))
+                return True
+            return False
+
+        try:
+            width, height = read_image_size(entry.path)
+        except (OSError, SyntaxError, ValueError):
+            width = height = 0  # битый файл: есть, но не годится
+        file_hash = content_hash(Path(entry.path)) if with_hash else None
+        self.records[key] = AssetRecord(st.st_mtime_ns, st.st_size, width, height, file_hash)
+        return True
+
+    def set_source_hash(self, jpg_name: str, source_hash: str) -> None:
+        """Отметить, из какого PNG (по хэшу) собран JPG; запись должна быть свежей."""
+        record = self.records.get(jpg_name)
+        if record is not None and record.source_hash != source_hash:
+            self.records[jpg_name] = record._replace(source_hash=source_hash)
+            self._dirty = True
+
+    def jpg(self, day: int) -> Optional[AssetRecord]:
+        return self.records.get(f"{day}.jpg")
+
+    def png(self, day: int) -> Optional[AssetRecord]:
+        return self.records.get(f"sources/{day}.png")
+
+    def day_bits(self, kind: str = "jpg", require_16x9: bool = False) -> int:
+        """Битсет дней, у которых есть файл kind ("jpg"/"png") (и он 16:9)."""
+        bits = 0
+        for key, record in self.records.items():
+            name = key.rsplit("/", 1)[-1]
+            day, _, ext = name.partition(".")
+            if ext.lower() != kind:
+                continue
+            if require_16x9 and not record.is_16x9:
+                continue
+            bits |= 1 << int(day)
+        return bits
+
+    def missing_days(
+        self,
+        first: int = 1,
+        last: int = TOTAL_DAYS,
+        kind: str = "jpg",
+        require_16x9: bool = False,
+    ) -> List[int]:
+        """Дни first..last без файла kind (или без 16:9 при require_16x9)."""
+        wanted = day_range_bits(first, last)
+        return list(iter_days(wanted & ~self.day_bits(kind, require_16x9)))
+
+
+def load_asset_manifest(hash_kinds: Iterable[str] = ()) -> AssetManifest:
+    """Манифест, сверенный с диском и сохранённый."""
+    manifest = AssetManifest()
+    manifest.refresh(hash_kinds)
+    manifest.save()
+    return manifest
+
+
+def format_days(days: List[int]) -> str:
+    """[1, 2, 3, 7] -> "1-3, 7"."""
+    parts = []
+    start = prev = None
+    for day in days + [None]:
+        if prev is not None and day == prev + 1:
+            prev = day
+            continue
+        if start is not None:
+            parts.append(str(start) if start == prev else f"{start}-{prev}")
+        start = prev = day
+    return ", ".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Обновить манифест обложек и показать дни без JPG 16:9."
+    )
+    parser.add_argument("range", nargs="?", default=f"1-{TOTAL_DAYS}", help="START-END")
+    parser.add_argument("--hashes", action="store_true", help="Досчитать хэши содержимого")
+    args = parser.parse_args()
+
+    start, _, end = args.range.partition("-")
+    first, last = sorted((int(start), int(end or start)))
+
+    manifest = AssetManifest()
+    updated = manifest.refresh(("png", "jpg") if args.hashes else ())
+    manifest.save()
+    print(f"Файлов в манифесте: {len(manifest.records)}, обновлено: {len(updated)}")
+
+    no_jpg = manifest.missing_days(first, last)
+    not_16x9 = sorted(set(manifest.missing_days(first, last, require_16x9=True)) - set(no_jpg))
+    no_png = manifest.missing_days(first, last, kind="png")
+    print(f"Нет JPG ({len(no_jpg)}): {format_days(no_jpg) or '—'}")
+    print(f"JPG не 16:9 ({len(not_16x9)}): {format_days(not_16x9) or '—'}")
+    print(f"Нет PNG ({len(no_png)}): {format_days(no_png) or '—'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Persistent cache of the channel's live broadcasts.
+
+The API does not allow ``mine`` together with ``broadcastStatus``, so the
+only listing is "every broadcast the channel ever had". Instead of paging
+through it on every run, the compact records are kept in
+runtime/live_broadcasts.json and refreshed in two bounded steps:
+
+1. the newest pages of the listing, until a page brings nothing new or
+   changed (at most REFRESH_MAX_PAGES);
+2. every cached broadcast that is not finished yet (created, ready, testing,
+   live...) is re-read by ID, 50 per call: its status may have moved on, or
+   it may have been deleted.
+
+Finished broadcasts (complete, revoked) never change again, so the cost of
+a refresh depends on recent activity, not on channel history. They can still
+be deleted, though: every FULL_SYNC_INTERVAL (or with ``--full-sync``) the
+whole listing is read and records that no longer exist are dropped. In
+memory the records are indexed by lifecycle group and by day number.
+
+    python broadcast_cache.py [--full-sync]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from mtm_content import parse_day_number
+from uploads_index import parse_published
+from yt_read import read_request
+
+RUNTIME_DIR = Path(__file__).resolve().parent / "runtime"
+BROADCAST_CACHE_FILE = RUNTIME_DIR / "live_broadcasts.json"
+CACHE_VERSION = 1
+
+# broadcast_status фильтра -> значения lifeCycleStatus
+LIFECYCLE_GROUPS: Dict[str, frozenset] = {
+    "completed": frozenset({"complete"}),
+    "active": frozenset({"live", "liveStarting", "testing", "testStarting"}),
+    "upcoming": frozenset({"upcoming", "created", "ready"}),
+}
+# Эти статусы больше не меняются — перепроверять не нужно
+TERMINAL_STATUSES = frozenset({"complete", "revoked"})
+
+REFRESH_MIN_PAGES = 1
+REFRESH_MAX_PAGES = 5
+# Как часто перечитывать весь список (удалённые завершённые трансляции)
+FULL_SYNC_INTERVAL = timedelta(days=7)
+# Лимит ID в одном liveBroadcasts.list
+IDS_PER_CALL = 50
+
+SCHEDULED_MIN = datetime.min.replace(tzinfo=timezone.utc)
+
+
+class Broadcast(NamedTuple):
+    """Only the fields the scripts read from a liveBroadcast resource."""
+
+    id: str
+    title: str
+    life_cycle_status: Optional[str]
+    scheduled_start: Optional[datetime]  # разобрано один раз при загрузке
+
+    @classmethod
+    def from_item(cls, item: dict) -> "Broadcast":
+        snippet = item.get("snippet", {})
+        return cls(
+            id=item["id"],
+            title=snippet.get("title", ""),
+            life_cycle_status=item.get("status", {}).get("lifeCycleStatus"),
+            scheduled_start=parse_published(snippet.get("scheduledStartTime")),
+        )
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.life_cycle_status in TERMINAL_STATUSES
+
+
+def latest_scheduled(broadcasts: Iterable[Broadcast]) -> Optional[Broadcast]:
+    """The latest scheduled broadcast (without a start time — the earliest)."""
+    return max(broadcasts, key=lambda b: b.scheduled_start or SCHEDULED_MIN, default=None)
+
+
+def lifecycle_group(status: Optional[str]) -> Optional[str]:
+    for group, statuses in LIFECYCLE_GROUPS.items():
+        if status in statuses:
+            return group
+    return None
+
+
+class BroadcastCache:
+    """Broadcasts by ID plus ``by_group`` / ``by_day`` indexes kept in sync."""
+
+    def __init__(self, path: Path = BROADCAST_CACHE_FILE) -> None:
+        self.path = path
+        self.records: Dict[str, Broadcast] = {}
+        self.by_group: Dict[str, Set[str]] = {group: set() for group in LIFECYCLE_GROUPS}
+        self.by_day: Dict[int, List[str]] = {}
+        self.full_synced_at: Optional[datetime] = None
+        self._dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # ------------------------------------------------------------------
+    # storage
+    # ------------------------------------------------------------------
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        try:
+            for broadcast_id, (title, status, start) in data["broadcasts"].items():
+                self._index(Broadcast(broadcast_id, title, status, parse_published(start)))
+            self.full_synced_at = parse_published(data.get("full_synced_at"))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            # Битый файл — как файл другой версии: пустой кэш, полное чтение
+            self._clear()
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        payload = {
+            "version": CACHE_VERSION,
+            "full_synced_at": self.full_synced_at.isoformat() if self.full_synced_at else None,
+            "broadcasts": {
+                b.id: [
+                    b.title,
+                    b.life_cycle_status,
+                    b.scheduled_start.isoformat() if b.scheduled_start else None,
+                ]
+                for b in self.records.values()
+            },
+        }
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # indexes
+    # ------------------------------------------------------------------
+    def _clear(self) -> None:
+        self.records.clear()
+        for ids in self.by_group.values():
+            ids.clear()
+        self.by_day.clear()
+        self.full_synced_at = None
+
+    def _index(self, broadcast: Broadcast) -> None:
+        self.records[broadcast.id] = broadcast
+        group = lifecycle_group(broadcast.life_cycle_status)
+        if group is not None:
+            self.by_group[group].add(broadcast.id)
+        day = parse_day_number(broadcast.title)
+        if day is not None:
+            self.by_day.setdefault(day, []).append(broadcast.id)
+
+    def _unindex(self, broadcast_id: str) -> None:
+        broadcast = self.records.pop(broadcast_id)
+        group = lifecycle_group(broadcast.life_cycle_status)
+        if group is not None:
+            self.by_group[group].discard(broadcast_id)
+        day = parse_day_number(broadcast.title)
+        if day is not None:
+            ids = self.by_day[day]
+            ids.remove(broadcast_id)
+            if not ids:
+                del self.by_day[day]
+
+    def put(self, broadcast: Broadcast) -> bool:
+        """Add or update a record; True if anything changed."""
+        old = self.records.get(broadcast.id)
+        if old == broadcast:
+            return False
+        if old is not None:
+            self._unindex(broadcast.id)
+        self._index(broadcast)
+        self._dirty = True
+        return True
+
+    def remove(self, broadcast_id: str) -> bool:
+        if broadcast_id not in self.records:
+            return False
+        self._unindex(broadcast_id)
+        self._dirty = True
+        return True
+
+    # ------------------------------------------------------------------
+    # refresh
+    # ------------------------------------------------------------------
+    def refresh(self, youtube, full: bool = False, verbose: bool = False) -> int:
+        """
+        Bring the cache up to date (see module docstring); returns the number
+        of added, changed or removed records. An empty cache, ``full=True``
+        or a last full read older than FULL_SYNC_INTERVAL reads the whole
+        listing and drops broadcasts that no longer exist.
+        """
+        now = datetime.now(timezone.utc)
+        full = (
+            full
+            or not self.records
+            or self.full_synced_at is None
+            or now - self.full_synced_at >= FULL_SYNC_INTERVAL
+        )
+        changed = 0
+        seen: Set[str] = set()
+        pages = 0
+
+        request = read_request(
+            youtube.liveBroadcasts(),
+            "liveBroadcasts.list",
+            part="id,snippet,status",
+            maxResults=50,
+            broadcastType="all",
+            mine=True,
+        )
+        while request is not None:
+            response = request.execute()
+            pages += 1
+            page_changed = 0
+            for item in response.get("items", []):
+                broadcast = Broadcast.from_item(item)
+                seen.add(broadcast.id)
+                page_changed += self.put(broadcast)
+            changed += page_changed
+
+            if not full and pages >= REFRESH_MIN_PAGES and (
+                not page_changed or pages >= REFRESH_MAX_PAGES
+            ):
+                break
+            request = youtube.liveBroadcasts().list_next(request, response)
+
+        if full:
+            for broadcast_id in set(self.records) - seen:
+                changed += self.remove(broadcast_id)
+            self.full_synced_at = now
+            self._dirty = True
+        else:
+            pending = [
+                b.id for b in self.records.values() if not b.is_terminal and b.id not in seen
+            ]
+            changed += self._recheck(youtube, pending)
+
+        if verbose:
+            kind = "полное чтение" if full else "обновление"
+            print(
+                f"Кэш трансляций ({kind}): страниц {pages}, изменений {changed}, "
+                f"всего {len(self.records)}."
+            )
+        return changed
+
+    def _recheck(self, youtube, broadcast_ids: List[str]) -> int:
+        """Re-read unfinished broadcasts by ID; the ones not returned were deleted."""
+        changed = 0
+        for start in range(0, len(broadcast_ids), IDS_PER_CALL):
+            chunk = broadcast_ids[start:start + IDS_PER_CALL]
+            response = read_request(
+                youtube.liveBroadcasts(),
+                "liveBroadcasts.list",
+                part="id,snippet,status",
+                id=",".join(chunk),
+                maxResults=IDS_PER_CALL,
+            ).execute()
+            returned = set()
+            for item in response.get("items", []):
+                broadcast = Broadcast.from_item(item)
+                returned.add(broadcast.id)
+                changed += self.put(broadcast)
+            for broadcast_id in set(chunk) - returned:
+                changed += self.remove(broadcast_id)
+        return changed
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+    def with_status(self, broadcast_status: str = "all") -> List[Broadcast]:
+        """Broadcasts of a lifecycle group ("upcoming", "active", "completed") or all."""
+        if broadcast_status not in LIFECYCLE_GROUPS:
+            return list(self.records.values())
+        return [self.records[i] for i in self.by_group[broadcast_status]]
+
+    def for_day(self, index: int) -> List[Broadcast]:
+        return [self.records[i] for i in self.by_day.get(index, ())]
+
+    def find_by_day(self, index: int) -> Optional[Broadcast]:
+        """The broadcast of the day; with several, the latest scheduled one."""
+        return latest_scheduled(self.for_day(index))
+
+
+def load_broadcast_cache(youtube, full: bool = False, verbose: bool = False) -> BroadcastCache:
+    """Кэш трансляций, обновлённый и сохранённый."""
+    cache = BroadcastCache()
+    cache.refresh(youtube, full=full, verbose=verbose)
+    cache.save()
+    return cache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обновить кэш трансляций канала.")
+    parser.add_argument(
+        "--full-sync",
+        action="store_true",
+        help="Перечитать весь список трансляций и удалить из кэша несуществующие",
+    )
+    args = parser.parse_args()
+
+    from yt_auth import get_youtube_service
+    from yt_read import print_read_summary
+    from yt_stream import SCOPES
+
+    cache = load_broadcast_cache(get_youtube_service(SCOPES), full=args.full_sync, verbose=True)
+    for group in LIFECYCLE_GROUPS:
+        print(f"{group}: {len(cache.by_group[group])}")
+    print(f"дней с трансляциями: {len(cache.by_day)}")
+    print_read_summary()
+
+
+if __name__ == "__main__":
+    main()
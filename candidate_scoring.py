@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Local scoring of thumbnail candidates with NumPy.
+
+All candidates of a day are scaled to one analysis size and stacked into a
+single array, so every metric is computed for all of them at once:
+
+- sharpness       variance of the Laplacian, squashed into 0..1;
+- title_contrast  spread of brightness (5th..95th percentile) in the band
+                  with the arched title and the day subtitle;
+- aspect_fit      how close the raw model output is to 16:9, i.e. how
+                  little crop_to_16x9 has to cut;
+- red_dominance   share of clearly coloured pixels that are red; only
+                  counted for days with the Sunday palette.
+
+The weighted sum is the candidate's total score; higher is better.
+"""
+from __future__ import annotations
+
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+from PIL import Image
+
+from thumbnail_image import crop_to_16x9, to_rgb
+
+# Размер, к которому приводятся кандидаты перед анализом
+ANALYSIS_SIZE = (480, 270)
+
+# Полоса заголовка и подзаголовка "Day N of 1000" (доли высоты)
+TITLE_BAND = (0.0, 0.55)
+
+# Дисперсия лапласиана, при которой резкость оценивается в 0.5
+SHARPNESS_HALF = 150.0
+# Пиксель считается цветным, если max(RGB) - min(RGB) больше этого
+MIN_SATURATION = 40
+
+WEIGHTS = {
+    "sharpness": 0.25,
+    "title_contrast": 0.4,
+    "aspect_fit": 0.35,
+}
+SUNDAY_RED_WEIGHT = 0.4
+
+
+class CandidateScore(NamedTuple):
+    total: float
+    sharpness: float
+    title_contrast: float
+    aspect_fit: float
+    red_dominance: float
+
+    def describe(self) -> str:
+        return (
+            f"{self.total:.3f} (резкость {self.sharpness:.2f}, "
+            f"контраст {self.title_contrast:.2f}, 16:9 {self.aspect_fit:.2f}, "
+            f"красный {self.red_dominance:.2f})"
+        )
+
+
+def _stack(images: Sequence[Image.Image]) -> np.ndarray:
+    """(K, H, W, 3) float32 из кадрированных до 16:9 и уменьшенных кандидатов."""
+    return np.stack([
+        np.asarray(
+            to_rgb(crop_to_16x9(img)).resize(ANALYSIS_SIZE, Image.Resampling.BILINEAR),
+            dtype=np.float32,
+        )
+        for img in images
+    ])
+
+
+def sharpness(gray: np.ndarray) -> np.ndarray:
+    """Дисперсия лапласиана для (K, H, W), приведённая к 0..1."""
+    lap = (
+        4 * gray[:, 1:-1, 1:-1]
+        - gray[:, :-2, 1:-1]
+        - gray[:, 2:, 1:-1]
+        - gray[:, 1:-1, :-2]
+        - gray[:, 1:-1, 2:]
+    )
+    var = lap.reshape(len(gray), -1).var(axis=1)
+    return var / (var + SHARPNESS_HALF)
+
+
+def title_contrast(gray: np.ndarray) -> np.ndarray:
+    """Разброс яркости 5..95 перцентиль в TITLE_BAND, 0..1."""
+    h = gray.shape[1]
+    band = gray[:, int(h * TITLE_BAND[0]):int(h * TITLE_BAND[1])]
+    flat = band.reshape(len(gray), -1)
+    low, high = np.percentile(flat, [5, 95], axis=1)
+    return (high - low) / 255.0
+
+
+def aspect_fit(sizes: Sequence[tuple[int, int]]) -> np.ndarray:
+    """1.0 для точных 16:9, меньше — чем сильнее исходник от них отличается."""
+    ratios = np.array([w / h for w, h in sizes], dtype=np.float64)
+    target = 16 / 9
+    return np.minimum(ratios, target) / np.maximum(ratios, target)
+
+
+def red_dominance(rgb: np.ndarray) -> np.ndarray:
+    """Доля красных (оттенок в пределах ±30° от красного) среди цветных пикселей."""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    high = rgb.max(axis=-1)
+    sat = high - rgb.min(axis=-1)
+    colored = sat > MIN_SATURATION
+    red = colored & (r == high) & (np.abs(g - b) <= sat / 2)
+
+    colored_count = colored.reshape(len(rgb), -1).sum(axis=1)
+    red_count = red.reshape(len(rgb), -1).sum(axis=1)
+    return np.where(colored_count > 0, red_count / np.maximum(colored_count, 1), 0.0)
+
+
+def score_candidates(images: Sequence[Image.Image], sunday: bool) -> List[CandidateScore]:
+    """Оценки кандидатов одного дня в том же порядке."""
+    if not images:
+        return []
+
+    rgb = _stack(images)
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    metrics = {
+        "sharpness": sharpness(gray),
+        "title_contrast": title_contrast(gray),
+        "aspect_fit": aspect_fit([img.size for img in images]),
+        "red_dominance": red_dominance(rgb),
+    }
+
+    weights = dict(WEIGHTS)
+    if sunday:
+        weights["red_dominance"] = SUNDAY_RED_WEIGHT
+    total = sum(metrics[name] * weight for name, weight in weights.items())
+    total = total / sum(weights.values())
+
+    return [
+        CandidateScore(
+            total=float(total[i]),
+            sharpness=float(metrics["sharpness"][i]),
+            title_contrast=float(metrics["title_contrast"][i]),
+            aspect_fit=float(metrics["aspect_fit"][i]),
+            red_dominance=float(metrics["red_dominance"][i]),
+        )
+        for i in range(len(images))
+    ]
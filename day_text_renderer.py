@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Local "Day N of 1000" rendering over a pool of generated backgrounds.
+
+Gemini is only used to refresh the background pool: styled images with the
+arched title and an empty area below it (see
+prompt_generator.generate_background_prompt). A day thumbnail is then the
+background plus the day subtitle drawn with Pillow, placed in the calmest
+spot of the band under the title and coloured against its brightness.
+Sundays use a separate pool with the red-only palette.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from day_index import index_to_date
+from generate_image_gemini import flush_writes, get_image_generator, write_outputs_async
+from mtm_content import SEQUENCE_DIR
+from prompt_generator import generate_background_prompt
+from thumbnail_image import crop_to_16x9, encode_jpeg_within_budget, to_rgb
+
+BACKGROUNDS_DIR = SEQUENCE_DIR / "backgrounds"
+BACKGROUND_PATTERN = re.compile(r"^bg_(sunday_)?(\d+)\.png$")
+
+# Шрифт подзаголовка: MTM_DAY_FONT из .env/окружения или первый найденный
+FONT_CANDIDATES = ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf")
+
+# Полоса под арочным заголовком (доли высоты), где ищется место для текста
+TEXT_BAND = (0.22, 0.55)
+# Высота шрифта в долях высоты картинки
+TEXT_HEIGHT = 0.08
+# Во сколько раз уменьшать картинку для анализа яркости
+ANALYSIS_REDUCE = 4
+
+
+def is_sunday(day_number: int) -> bool:
+    # Monday=0 ... Sunday=6
+    return index_to_date(day_number).weekday() == 6
+
+
+def background_path(seed: int, sunday: bool) -> Path:
+    prefix = "bg_sunday_" if sunday else "bg_"
+    return BACKGROUNDS_DIR / f"{prefix}{seed}.png"
+
+
+def list_backgrounds(sunday: bool) -> list[tuple[int, Path]]:
+    """(seed, path) фонов пула, отсортированные по seed."""
+    if not BACKGROUNDS_DIR.is_dir():
+        return []
+
+    pool = []
+    for entry in os.scandir(BACKGROUNDS_DIR):
+        match = BACKGROUND_PATTERN.match(entry.name)
+        if match and bool(match.group(1)) == sunday:
+            pool.append((int(match.group(2)), Path(entry.path)))
+    return sorted(pool)
+
+
+def pick_background(day_number: int) -> Path:
+    """Детерминированно выбирает фон для дня из подходящего пула."""
+    sunday = is_sunday(day_number)
+    pool = list_backgrounds(sunday)
+    if not pool:
+        kind = "воскресных " if sunday else ""
+        raise RuntimeError(
+            f"Пул {kind}фонов пуст ({BACKGROUNDS_DIR}). "
+            f"Запусти: python day_text_renderer.py refresh{' --sunday' if sunday else ''}"
+        )
+    # Соседние дни получают разные фоны
+    return pool[(day_number * 7919) % len(pool)][1]
+
+
+def load_font(size: int) -> ImageFont.FreeTypeFont:
+    custom = os.getenv("MTM_DAY_FONT")
+    for name in ([custom] if custom else []) + list(FONT_CANDIDATES):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def find_text_row(
+    gray: np.ndarray, box_w: int, box_h: int, band: tuple[float, float] = TEXT_BAND
+) -> tuple[int, float]:
+    """
+    Ищет в полосе band строку y (по центру по горизонтали), где область
+    box_w x box_h самая однородная (минимальное стандартное отклонение).
+    Все позиции считаются разом через интегральные изображения.
+    Возвращает (y, средняя яркость области).
+    """
+    h, w = gray.shape
+    box_w = min(box_w, w)
+    box_h = min(box_h, h)
+    x0 = (w - box_w) // 2
+    columns = gray[:, x0:x0 + box_w].astype(np.float64)
+
+    # Суммы по строкам, затем интегрально по вертикали
+    row_sum = np.concatenate(([0.0], np.cumsum(columns.sum(axis=1))))
+    row_sq = np.concatenate(([0.0], np.cumsum((columns ** 2).sum(axis=1))))
+
+    y_min = int(h * band[0])
+    y_max = max(y_min, min(int(h * band[1]), h - box_h))
+    ys = np.arange(y_min, y_max + 1)
+
+    n = box_w * box_h
+    sums = row_sum[ys + box_h] - row_sum[ys]
+    sq = row_sq[ys + box_h] - row_sq[ys]
+    means = sums / n
+    stds = np.sqrt(np.maximum(sq / n - means ** 2, 0.0))
+
+    best = int(np.argmin(stds))
+    return int(ys[best]), float(means[best])
+
+
+def render_day_text(background: Image.Image, day_number: int) -> Image.Image:
+    """Возвращает копию фона с подзаголовком "Day N of 1000"."""
+    img = to_rgb(background).copy()
+    draw = ImageDraw.Draw(img)
+
+    text = f"Day {day_number} of 1000"
+    font = load_font(max(12, int(img.height * TEXT_HEIGHT)))
+    stroke = max(2, font.size // 14)
+    left, top, right, bottom = draw.textbbox(
+        (0, 0), text, font=font, stroke_width=stroke
+    )
+    text_w, text_h = right - left, bottom - top
+
+    gray = np.asarray(img.convert("L").reduce(ANALYSIS_REDUCE), dtype=np.float32)
+    # Запас вокруг текста, чтобы учитывать и ближайший фон
+    pad = 1.2
+    y_small, mean = find_text_row(
+        gray,
+        int(text_w * pad) // ANALYSIS_REDUCE,
+        int(text_h * pad) // ANALYSIS_REDUCE,
+    )
+
+    white, black = (255, 255, 255), (0, 0, 0)
+    fill, stroke_fill = (white, black) if mean < 128 else (black, white)
+    x = (img.width - text_w) // 2 - left
+    y = y_small * ANALYSIS_REDUCE + int(text_h * (pad - 1) / 2) - top
+    draw.text(
+        (x, y), text, font=font, fill=fill, stroke_width=stroke, stroke_fill=stroke_fill
+    )
+    return img
+
+
+def render_day_thumbnail(day_number: int) -> bytes:
+    """
+    Рисует обложку дня из пула фонов без обращения к API и возвращает
+    JPEG-байты; PNG/JPEG пишутся в SEQUENCE_DIR в фоне.
+    """
+    with Image.open(pick_background(day_number)) as background:
+        img = render_day_text(background, day_number)
+
+    jpeg_bytes = encode_jpeg_within_budget(img).data
+    write_outputs_async(day_number, img, jpeg_bytes)
+    return jpeg_bytes
+
+
+def refresh_background_pool(
+    count: int, sunday: bool = False, concurrency: int = 3
+) -> list[Path]:
+    """Генерирует через Gemini count новых фонов (следующие свободные seed)."""
+    generator = get_image_generator()
+    pool = list_backgrounds(sunday)
+    first_seed = pool[-1][0] + 1 if pool else 1
+    seeds = range(first_seed, first_seed + count)
+    BACKGROUNDS_DIR.mkdir(parents=True, exist_ok=True)
+
+    def make(seed: int) -> Path:
+        prompt = generate_background_prompt(seed, sunday)
+        raw = generator.generate_raw(prompt, label=f"bg {seed}")
+        path = background_path(seed, sunday)
+        crop_to_16x9(Image.open(BytesIO(raw))).save(path, format="PNG")
+        print(f"Saved background: {path}")
+        return path
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool_exec:
+        return list(pool_exec.map(make, seeds))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Пул фонов и локальная отрисовка 'Day N of 1000'.\n\n"
+            "Примеры:\n"
+            "  day_text_renderer.py refresh --count 20\n"
+            "  day_text_renderer.py refresh --count 5 --sunday\n"
+            "  day_text_renderer.py render 300-330\n"
+        ),
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    refresh = sub.add_parser("refresh", help="Сгенерировать новые фоны через Gemini")
+    refresh.add_argument("--count", type=int, default=10)
+    refresh.add_argument("--sunday", action="store_true", help="Красные фоны для воскресений")
+    refresh.add_argument("--concurrency", type=int, default=3)
+
+    render = sub.add_parser("render", help="Нарисовать обложки дней локально")
+    render.add_argument("range", help="День или диапазон START-END")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.command == "refresh":
+        refresh_background_pool(args.count, args.sunday, args.concurrency)
+        return
+
+    start, _, end = args.range.partition("-")
+    first, last = sorted((int(start), int(end or start)))
+    try:
+        for day in range(first, last + 1):
+            render_day_thumbnail(day)
+    except RuntimeError as e:
+        print(f"[{day}] ОШИБКА: {e}")
+        sys.exit(1)
+    finally:
+        flush_writes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Bulk thumbnail generation through Gemini batch jobs.
+
+Instead of one synchronous generate_content call per day, the prompts of a
+whole range are submitted as asynchronous batch jobs with inline requests.
+The jobs are polled with exponential backoff, and every returned image goes
+through the same path as a synchronous generation: raw bytes into the
+ImageCache, then 16:9 crop + JPEG under budget + PNG/JPEG into
+SOURCES_DIR/SEQUENCE_DIR. Days already in the cache are not sent at all.
+
+Every request carries the full base image, and inline batch requests are
+limited in total size, so the range is split into several jobs of at most
+INLINE_BATCH_MAX_BYTES each. All of them are submitted at once and polled
+together.
+
+Set GEMINI_BASE_URL to run against a local stand-in of the API
+(utils/gemini_batch_standin.py) instead of the real endpoint.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from dotenv import load_dotenv
+from google.genai import types
+
+from generate_image_gemini import (
+    MODEL_ID,
+    ImageGenerator,
+    _extract_image_bytes,
+    _get_output_paths,
+    flush_writes,
+    generation_config,
+    get_image_generator,
+)
+from prompt_generator import generate_prompts
+
+# Лимит API на размер batch-запроса с inline-запросами — 20 МБ, берём с запасом
+INLINE_BATCH_MAX_BYTES = 18 * 1024 * 1024
+
+# Опрос статуса: 10 с, x1.5 каждый раз, не реже раза в 2 минуты
+POLL_INITIAL_SECONDS = 10.0
+POLL_MAX_SECONDS = 120.0
+POLL_MULTIPLIER = 1.5
+# Batch-задания выполняются до 24 часов
+POLL_TIMEOUT_SECONDS = 24 * 60 * 60
+
+DONE_STATES = {
+    types.JobState.JOB_STATE_SUCCEEDED,
+    types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+}
+FAILED_STATES = {
+    types.JobState.JOB_STATE_FAILED,
+    types.JobState.JOB_STATE_CANCELLED,
+    types.JobState.JOB_STATE_EXPIRED,
+}
+
+
+def split_into_jobs(days: List[int], request_bytes: int) -> List[List[int]]:
+    """Делит дни на группы, каждая из которых влезает в INLINE_BATCH_MAX_BYTES."""
+    per_job = max(1, INLINE_BATCH_MAX_BYTES // max(1, request_bytes))
+    return [days[i:i + per_job] for i in range(0, len(days), per_job)]
+
+
+def submit_jobs(
+    generator: ImageGenerator, prompts: Dict[int, str], days: List[int]
+) -> List[str]:
+    """Отправляет batch-задания для days; возвращает их имена."""
+    # base64 картинки + текст промпта — основной объём одного запроса
+    request_bytes = len(generator.base_part.inline_data.data) * 4 // 3 + 4096
+    names = []
+    for group in split_into_jobs(days, request_bytes):
+        requests = [
+            types.InlinedRequest(
+                contents=[prompts[day], generator.base_part],
+                config=generation_config(),
+                metadata={"day": str(day)},
+            )
+            for day in group
+        ]
+        job = generator.client.batches.create(
+            model=MODEL_ID,
+            src=requests,
+            config=types.CreateBatchJobConfig(
+                display_name=f"mtm-thumbnails-{group[0]}-{group[-1]}"
+            ),
+        )
+        print(f"Batch-задание {job.name}: дни {group[0]}–{group[-1]} ({len(group)} шт.)")
+        names.append(job.name)
+    return names
+
+
+def wait_for_jobs(
+    client,
+    names: Iterable[str],
+    initial: float = POLL_INITIAL_SECONDS,
+    maximum: float = POLL_MAX_SECONDS,
+    timeout: float = POLL_TIMEOUT_SECONDS,
+) -> List[types.BatchJob]:
+    """Опрашивает задания с растущим интервалом, пока все не завершатся."""
+    names = list(names)
+    pending = list(names)
+    finished: Dict[str, types.BatchJob] = {}
+    delay = initial
+    deadline = time.monotonic() + timeout
+
+    while True:
+        for name in list(pending):
+            job = client.batches.get(name=name)
+            if job.state in DONE_STATES or job.state in FAILED_STATES:
+                print(f"Batch-задание {name}: {job.state.name}")
+                finished[name] = job
+                pending.remove(name)
+
+        if not pending:
+            return [finished[name] for name in names]
+
+        if time.monotonic() + delay > deadline:
+            raise RuntimeError(
+                f"Batch-задания не завершились за {timeout:.0f} с: {', '.join(pending)}"
+            )
+        print(f"Ожидаю {len(pending)} batch-задан., следующая проверка через {delay:.0f} с…")
+        time.sleep(delay)
+        delay = min(delay * POLL_MULTIPLIER, maximum)
+
+
+def collect_job_images(
+    job: types.BatchJob,
+) -> tuple[Dict[int, Union[bytes, Exception]], Optional[Exception]]:
+    """
+    ({day: сырые байты картинки | ошибка}, ошибка задания целиком)
+    из inline-ответов задания.
+    """
+    if job.state in FAILED_STATES:
+        reason = job.error.message if job.error else job.state.name
+        return {}, RuntimeError(f"Batch-задание {job.name}: {reason}")
+
+    results: Dict[int, Union[bytes, Exception]] = {}
+    responses = job.dest.inlined_responses if job.dest else None
+    for item in responses or []:
+        day = int((item.metadata or {})["day"])
+        if item.error is not None:
+            results[day] = RuntimeError(item.error.message or "ошибка запроса")
+            continue
+        try:
+            results[day] = _extract_image_bytes(item.response)
+        except RuntimeError as e:
+            results[day] = e
+    return results, None
+
+
+def generate_batch(
+    days: Iterable[int],
+    salt: str = "",
+    generator: Optional[ImageGenerator] = None,
+    job_names: Optional[List[str]] = None,
+    poll_initial: float = POLL_INITIAL_SECONDS,
+    on_done: Optional[Callable[[int, Optional[Exception]], None]] = None,
+) -> Dict[int, Union[bytes, Exception]]:
+    """
+    Генерирует обложки дней через batch-задания. Возвращает
+    {day: JPEG-байты | ошибка}, как ImageGenerator.generate_many().
+    job_names — подключиться к уже отправленным заданиям вместо новых
+    (например, после прерванного запуска).
+    """
+    generator = generator or get_image_generator()
+    results: Dict[int, Union[bytes, Exception]] = {}
+    days = sorted(set(days))
+    if not days:
+        return results
+
+    prompts = generate_prompts(days[0], days[-1], salt)
+
+    def finish(day: int, image: Union[bytes, Exception]) -> None:
+        error = image if isinstance(image, Exception) else None
+        if error is None:
+            try:
+                results[day] = generator.finish(day, image)
+            except Exception as e:  # noqa: BLE001
+                error = e
+        if error is not None:
+            results[day] = error
+        if on_done is not None:
+            on_done(day, error)
+
+    to_send = []
+    for day in days:
+        cached = generator.cache.get(generator.cache_key(prompts[day]))
+        if cached is not None:
+            finish(day, cached)
+        else:
+            to_send.append(day)
+
+    if to_send or job_names:
+        if to_send and not job_names:
+            print(f"Из кэша: {len(days) - len(to_send)}, в batch: {len(to_send)}")
+            job_names = submit_jobs(generator, prompts, to_send)
+
+        for job in wait_for_jobs(generator.client, job_names, initial=poll_initial):
+            images, job_error = collect_job_images(job)
+            for day, image in sorted(images.items()):
+                if day not in prompts or day in results:
+                    continue
+                if isinstance(image, bytes):
+                    generator.cache.put(generator.cache_key(prompts[day]), image)
+                finish(day, image)
+            if job_error is not None:
+                print(f"ОШИБКА: {job_error}")
+
+    for day in days:
+        if day not in results:
+            finish(day, RuntimeError("Нет ответа в batch-задании"))
+    return results
+
+
+def parse_range(arg: str) -> tuple[int, int]:
+    start, _, end = arg.partition("-")
+    first, last = sorted((int(start), int(end or start)))
+    if first < 1:
+        raise SystemExit("day_number должен быть >= 1")
+    return first, last
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description="Массовая генерация обложек через Gemini batch-задания.",
+    )
+    parser.add_argument("range", help="День или диапазон START-END")
+    parser.add_argument("--salt", default="", help="Другой вариант промптов")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Генерировать и дни, для которых JPEG уже есть",
+    )
+    parser.add_argument(
+        "--job",
+        action="append",
+        default=None,
+        help="Имя уже отправленного задания (batches/...) — дождаться его результатов",
+    )
+    args = parser.parse_args()
+
+    first, last = parse_range(args.range)
+    days = [
+        day
+        for day in range(first, last + 1)
+        if args.force or not _get_output_paths(day)[1].exists()
+    ]
+    if not days:
+        print("Все обложки диапазона уже есть.")
+        return
+
+    results = generate_batch(days, args.salt, job_names=args.job)
+    flush_writes()
+
+    failed = [day for day, result in results.items() if isinstance(result, Exception)]
+    print(f"Готово: {len(results) - len(failed)}, ошибок {len(failed)}.")
+    for day in failed:
+        print(f"  [{day}] {results[day]}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
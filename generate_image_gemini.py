@@ -1,14 +1,28 @@
 #!/usr/bin/env python3
 import os
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from pathlib import Path
 from io import BytesIO
+from typing import Callable, Dict, Iterable, Optional, Union
 
 from dotenv import load_dotenv
 from PIL import Image
 from google import genai
 from google.genai import types
 
-from prompt_generator import generate_prompt
+from candidate_scoring import score_candidates
+from image_cache import ImageCache, image_cache_key, sha256_hex
+from latency_stats import LatencyHistogram
+from prompt_generator import generate_prompt, generate_prompts, uses_sunday_palette
+from thumbnail_image import crop_to_16x9, encode_jpeg_within_budget
 
 
 # Базовые пути проекта
@@ -22,13 +36,51 @@ BASE_IMAGE = PROJECT_ROOT / "automation" / "sources" / "front_base.png"
 # Модель Nano Banana
 MODEL_ID = "gemini-2.5-flash-image"
 
+# Длинная сторона базовой картинки, отправляемой в модель: больше модель
+# всё равно не использует, а payload каждого запроса уменьшается
+BASE_IMAGE_MAX_SIDE = 1024
+
+# Дедлайн одного запроса к модели (секунды)
+CALL_DEADLINE_SECONDS = 180.0
+# Если ответа нет дольше этого перцентиля прошлых задержек — шлём дубликат
+HEDGE_PERCENTILE = 95.0
+MAX_HEDGES = 1
+# Пока запрос стоит в очереди пула, его часы не идут — проверяем, начался ли он
+QUEUE_POLL_SECONDS = 0.25
+
+
+class GenerationTimeout(RuntimeError):
+    """Модель не ответила до дедлайна запроса."""
+
+
+class ImageBudgetExceeded(RuntimeError):
+    """Бюджет времени на генерацию за запуск исчерпан — день пропущен."""
+
+
+def call_workers(concurrency: int, candidates: int = 1) -> int:
+    """Потоков под запросы к модели: каждый кандидат каждого дня плюс его дубликаты."""
+    return max(1, concurrency) * max(1, candidates) * (1 + MAX_HEDGES)
+
 
 def _init_client() -> genai.Client:
     load_dotenv()
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         raise RuntimeError("GEMINI_API_KEY не найден в окружении/.env")
-    return genai.Client(api_key=api_key)
+
+    # GEMINI_BASE_URL — локальная подмена API (utils/gemini_batch_standin.py)
+    base_url = os.environ.get("GEMINI_BASE_URL")
+    http_options = types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def generation_config() -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        response_modalities=["IMAGE"],
+        image_config=types.ImageConfig(
+            aspect_ratio="16:9",
+        ),
+    )
 
 
 def _get_output_paths(day_number: int) -> tuple[Path, Path]:
@@ -43,66 +95,400 @@ def _get_output_paths(day_number: int) -> tuple[Path, Path]:
     return png_path, jpg_path
 
 
-def generate_image(day_number: int) -> None:
-    client = _init_client()
+def _load_base_image_part(path: Path, max_side: Optional[int]) -> types.Part:
+    """
+    Открывает базовую картинку один раз, при необходимости уменьшает до
+    max_side по длинной стороне и кодирует в PNG для всех последующих запросов.
+    """
+    with Image.open(path) as src:
+        img = src.convert("RGB")
 
-    prompt = generate_prompt(day_number)
-    base_img = Image.open(BASE_IMAGE).convert("RGB")
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    buf = BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return types.Part.from_bytes(data=buf.getvalue(), mime_type="image/png")
 
-    response = client.models.generate_content(
-        model=MODEL_ID,
-        contents=[prompt, base_img],
-        config=types.GenerateContentConfig(
-            response_modalities=["IMAGE"],
-            image_config=types.ImageConfig(
-                aspect_ratio="16:9",
-            ),
-        ),
-    )
 
-    # Достаём байты изображения
-    image_bytes = None
-    for part in response.parts:
+def _extract_image_bytes(response) -> bytes:
+    for part in response.parts or []:
         if getattr(part, "inline_data", None) is not None:
-            image_bytes = part.inline_data.data
-            break
+            return part.inline_data.data
+    raise RuntimeError("Модель не вернула изображение")
 
-    if not image_bytes:
-        raise RuntimeError("Модель не вернула изображение")
 
-    img = Image.open(BytesIO(image_bytes))
-    w, h = img.size
-    target_h = int(round(w * 9 / 16))
-    if target_h < h:
-        crop_y = (h - target_h) // 2
-        img = img.crop((0, crop_y, w, crop_y + target_h))
+def _encode_jpeg(day_number: int, img: Image.Image) -> bytes:
+    # 1280x720, progressive, quality подбирается под лимит YouTube в 2 МБ
+    encoded = encode_jpeg_within_budget(img)
+    print(
+        f"[{day_number}] JPEG {len(encoded.data) // 1024} KB "
+        f"({encoded.size[0]}x{encoded.size[1]}, q={encoded.quality})"
+    )
+    return encoded.data
+
 
+def _write_outputs(day_number: int, img: Image.Image, jpeg_bytes: bytes) -> None:
     png_path, jpg_path = _get_output_paths(day_number)
 
     # PNG в sources/
     png_path.parent.mkdir(parents=True, exist_ok=True)
     img.save(png_path, format="PNG")
 
-    # JPEG-копия в sequence/
+    # JPEG-копия в sequence/ — те же байты, что ушли в YouTube
     jpg_path.parent.mkdir(parents=True, exist_ok=True)
-    # На всякий случай приводим к RGB (на случай прозрачности)
-    img_rgb = img.convert("RGB")
-    img_rgb.save(jpg_path, format="JPEG", quality=95)
+    jpg_path.write_bytes(jpeg_bytes)
 
     print(f"Saved PNG:  {png_path}")
     print(f"Saved JPEG: {jpg_path}")
 
 
+class ThumbnailWriter:
+    """
+    Фоновая запись PNG/JPEG в SEQUENCE_DIR: генерация не ждёт диска,
+    а готовые JPEG-байты сразу доступны для загрузки в YouTube.
+    """
+
+    def __init__(self) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending: list[Future] = []
+        self._lock = threading.Lock()
+
+    def submit(self, day_number: int, img: Image.Image, jpeg_bytes: bytes) -> None:
+        future = self._pool.submit(_write_outputs, day_number, img, jpeg_bytes)
+        with self._lock:
+            self._pending.append(future)
+
+    def flush(self) -> None:
+        """Ждёт завершения всех записей; ошибки записи печатаются."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            error = future.exception()
+            if error is not None:
+                print(f"ОШИБКА записи обложки на диск: {error}")
+
+
+_WRITER = ThumbnailWriter()
+
+
+def write_outputs_async(day_number: int, img: Image.Image, jpeg_bytes: bytes) -> None:
+    """Поставить запись PNG/JPEG дня в фоновую очередь."""
+    _WRITER.submit(day_number, img, jpeg_bytes)
+
+
+def flush_writes() -> None:
+    """Дождаться записи на диск всех сгенерированных в процессе обложек."""
+    _WRITER.flush()
+
+
+class ImageGenerator:
+    """
+    Долгоживущий генератор обложек: один genai.Client (с пулом соединений)
+    и базовая картинка, декодированная и закодированная один раз.
+    Потокобезопасен — generate() можно вызывать из нескольких потоков.
+    """
+
+    def __init__(
+        self,
+        base_image: Path = BASE_IMAGE,
+        max_base_side: Optional[int] = BASE_IMAGE_MAX_SIDE,
+        client: Optional[genai.Client] = None,
+        cache: Optional[ImageCache] = None,
+        latency: Optional[LatencyHistogram] = None,
+        call_deadline: float = CALL_DEADLINE_SECONDS,
+        hedge_percentile: Optional[float] = HEDGE_PERCENTILE,
+    ) -> None:
+        self.client = client or _init_client()
+        self.base_part = _load_base_image_part(base_image, max_base_side)
+        self.base_hash = sha256_hex(self.base_part.inline_data.data)
+        self.cache = cache if cache is not None else ImageCache()
+        # Задержки запросов копятся между запусками (runtime/gemini_latency.json)
+        self.latency = latency if latency is not None else LatencyHistogram()
+        self.call_deadline = call_deadline
+        # None — без дубликатов запросов
+        self.hedge_percentile = hedge_percentile
+        self._calls_lock = threading.Lock()
+        self._call_workers = call_workers(1)
+        self._calls = ThreadPoolExecutor(max_workers=self._call_workers)
+
+    def reserve_call_workers(self, workers: int) -> None:
+        """
+        Расширяет пул запросов до workers потоков, чтобы запросы не ждали
+        в очереди. Запросы старого пула доработают в нём.
+        """
+        with self._calls_lock:
+            if workers <= self._call_workers:
+                return
+            old = self._calls
+            self._calls = ThreadPoolExecutor(max_workers=workers)
+            self._call_workers = workers
+        old.shutdown(wait=False)
+
+    def generate(
+        self,
+        day_number: int,
+        salt: str = "",
+        prompt: Optional[str] = None,
+        deadline: Optional[float] = None,
+        candidates: int = 1,
+    ) -> bytes:
+        """
+        Генерирует обложку дня и возвращает её JPEG-байты. PNG и JPEG
+        пишутся на диск в фоне (см. flush_writes). deadline — момент
+        time.monotonic(), позже которого ответ модели не ждём.
+        candidates > 1 — столько вариантов запрашивается параллельно,
+        остаётся лучший по локальной оценке (candidate_scoring).
+        """
+        if prompt is None:
+            prompt = generate_prompt(day_number, salt)
+        self.reserve_call_workers(call_workers(1, candidates))
+        if candidates > 1:
+            image_bytes = self._best_candidate(day_number, prompt, candidates, deadline)
+        else:
+            image_bytes = self.generate_raw(prompt, label=str(day_number), deadline=deadline)
+        return self.finish(day_number, image_bytes)
+
+    def _best_candidate(
+        self, day_number: int, prompt: str, count: int, deadline: Optional[float]
+    ) -> bytes:
+        """Сырые байты лучшего из count кандидатов; неудавшиеся пропускаются."""
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            futures = [
+                pool.submit(
+                    self.generate_raw, prompt, f"{day_number}#{i + 1}", deadline, i
+                )
+                for i in range(count)
+            ]
+
+        raws: list[tuple[int, bytes]] = []
+        errors = []
+        for i, future in enumerate(futures):
+            if future.exception() is None:
+                raws.append((i, future.result()))
+            else:
+                errors.append(future.exception())
+                print(f"[{day_number}] кандидат {i + 1}: ОШИБКА {future.exception()}")
+        if not raws:
+            raise errors[0]
+
+        images = [Image.open(BytesIO(raw)) for _, raw in raws]
+        scores = score_candidates(images, uses_sunday_palette(day_number))
+        best = max(range(len(raws)), key=lambda n: scores[n].total)
+        for n, ((i, _), score) in enumerate(zip(raws, scores)):
+            mark = "*" if n == best else " "
+            print(f"[{day_number}] {mark} кандидат {i + 1}: {score.describe()}")
+        return raws[best][1]
+
+    def finish(self, day_number: int, image_bytes: bytes) -> bytes:
+        """Сырой ответ модели -> обложка дня (JPEG-байты, файлы пишутся в фоне)."""
+        # Декодируем и обрезаем один раз (без полей, если модель их добавила),
+        # JPEG кодируем сразу в память
+        img = crop_to_16x9(Image.open(BytesIO(image_bytes)))
+        jpeg_bytes = _encode_jpeg(day_number, img)
+        _WRITER.submit(day_number, img, jpeg_bytes)
+        return jpeg_bytes
+
+    def cache_key(self, prompt: str, candidate: int = 0) -> str:
+        return image_cache_key(MODEL_ID, prompt, self.base_hash, candidate)
+
+    def generate_raw(
+        self,
+        prompt: str,
+        label: str = "",
+        deadline: Optional[float] = None,
+        candidate: int = 0,
+    ) -> bytes:
+        """
+        Сырые байты ответа модели для промпта (через кэш ImageCache).
+        candidate — номер варианта того же промпта, у каждого свой ключ кэша.
+        """
+        key = self.cache_key(prompt, candidate)
+
+        image_bytes = self.cache.get(key)
+        if image_bytes is not None:
+            print(f"[{label}] Ответ модели взят из кэша ({key[:12]}).")
+            return image_bytes
+
+        return self._call_hedged(prompt, key, label, deadline)
+
+    def _request(self, prompt: str, key: str) -> bytes:
+        started = time.monotonic()
+        response = self.client.models.generate_content(
+            model=MODEL_ID,
+            contents=[prompt, self.base_part],
+            config=generation_config(),
+        )
+        self.latency.record(time.monotonic() - started)
+        image_bytes = _extract_image_bytes(response)
+        # Кэшируем в потоке запроса: ответ, пришедший после дедлайна или
+        # проигравший дубликату, достанется следующему запуску
+        self.cache.put(key, image_bytes)
+        return image_bytes
+
+    def _call_hedged(
+        self, prompt: str, key: str, label: str, deadline: Optional[float]
+    ) -> bytes:
+        """
+        Запрос с дедлайном call_deadline, который (как и ожидание перед
+        дубликатом) отсчитывается от фактического начала запроса, а не от
+        постановки в очередь. Если ответа нет дольше hedge_percentile прошлых
+        задержек, отправляется дубликат; берётся первый успешный ответ.
+        deadline — общий момент time.monotonic(), после которого не ждём вовсе.
+        Ещё не начатые запросы при выходе отменяются.
+        """
+        hedge_after = None
+        if self.hedge_percentile:
+            hedge_after = self.latency.percentile(self.hedge_percentile)
+        run_deadline = deadline if deadline is not None else float("inf")
+
+        started_at: list[float] = []
+
+        def request() -> bytes:
+            started_at.append(time.monotonic())
+            return self._request(prompt, key)
+
+        queued_at = time.monotonic()
+        pending = {self._calls.submit(request)}
+        hedges = 0
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                now = time.monotonic()
+                hedge_at = None
+                if started_at:
+                    started = started_at[0]
+                    call_deadline = min(started + self.call_deadline, run_deadline)
+                    if hedge_after is not None and hedges < MAX_HEDGES:
+                        hedge_at = started + hedge_after
+                    wake_at = min(call_deadline, hedge_at) if hedge_at is not None else call_deadline
+                else:
+                    call_deadline = run_deadline
+                    wake_at = min(now + QUEUE_POLL_SECONDS, run_deadline)
+
+                done, pending = wait(
+                    pending,
+                    timeout=max(0.0, wake_at - now),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+
+                now = time.monotonic()
+                if pending and now >= call_deadline:
+                    waited = now - (started_at[0] if started_at else queued_at)
+                    raise GenerationTimeout(f"[{label}] Модель не ответила за {waited:.0f} с")
+                if pending and hedge_at is not None and now >= hedge_at:
+                    print(f"[{label}] Нет ответа за {hedge_after:.1f} с — отправляю дубликат запроса.")
+                    pending.add(self._calls.submit(self._request, prompt, key))
+                    hedges += 1
+        finally:
+            # Начатый запрос прервать нельзя (его ответ всё равно попадёт
+            # в кэш), а стоящие в очереди — снимаем
+            for future in pending:
+                future.cancel()
+
+        raise error
+
+    def generate_many(
+        self,
+        days: Iterable[int],
+        concurrency: int = 3,
+        on_done: Optional[Callable[[int, Optional[Exception]], None]] = None,
+        salt: str = "",
+        budget: Optional[float] = None,
+        candidates: int = 1,
+    ) -> Dict[int, Union[bytes, Exception]]:
+        """
+        Генерирует обложки для нескольких дней, не больше concurrency
+        запросов одновременно. Возвращает {day: JPEG-байты | ошибка};
+        on_done(day, error) вызывается по мере готовности каждого дня.
+        budget — секунды на всю генерацию: после них оставшиеся дни
+        получают ImageBudgetExceeded вместо запроса к модели.
+        candidates — вариантов на день (см. generate), запросов в полёте
+        до concurrency * candidates.
+        """
+        results: Dict[int, Union[bytes, Exception]] = {}
+        days = list(days)
+        if not days:
+            return results
+
+        # Все промпты диапазона — за один проход по каталогу вариантов
+        prompts = generate_prompts(min(days), max(days), salt)
+        self.reserve_call_workers(call_workers(concurrency, candidates))
+        run_deadline = time.monotonic() + budget if budget is not None else None
+
+        def generate_day(day: int) -> bytes:
+            if run_deadline is not None and time.monotonic() >= run_deadline:
+                raise ImageBudgetExceeded("бюджет времени на генерацию исчерпан")
+            try:
+                return self.generate(
+                    day, salt, prompts[day], deadline=run_deadline, candidates=candidates
+                )
+            except GenerationTimeout as e:
+                if run_deadline is not None and time.monotonic() >= run_deadline:
+                    raise ImageBudgetExceeded("бюджет времени на генерацию исчерпан") from e
+                raise
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(generate_day, day): day for day in days}
+            for future in as_completed(futures):
+                day = futures[future]
+                if future.cancelled():
+                    error = ImageBudgetExceeded("бюджет времени на генерацию исчерпан")
+                else:
+                    error = future.exception()
+                if isinstance(error, ImageBudgetExceeded):
+                    # Бюджет кончился — дни, ещё стоящие в очереди, не запускаем
+                    for other in futures:
+                        other.cancel()
+                results[day] = error if error is not None else future.result()
+                if on_done is not None:
+                    on_done(day, error)
+
+        return results
+
+
+_GENERATOR: Optional[ImageGenerator] = None
+_GENERATOR_LOCK = threading.Lock()
+
+
+def get_image_generator() -> ImageGenerator:
+    """Общий ImageGenerator процесса (создаётся при первом обращении)."""
+    global _GENERATOR
+    with _GENERATOR_LOCK:
+        if _GENERATOR is None:
+            _GENERATOR = ImageGenerator()
+        return _GENERATOR
+
+
+def generate_image(day_number: int, salt: str = "", candidates: int = 1) -> bytes:
+    """Генерирует обложку дня, дожидается записи файлов, возвращает JPEG-байты."""
+    jpeg_bytes = get_image_generator().generate(day_number, salt, candidates=candidates)
+    flush_writes()
+    return jpeg_bytes
+
+
 if __name__ == "__main__":
-    import sys
+    import argparse
 
-    if len(sys.argv) < 2:
-        print("Usage: python generate_image_gemini.py <day_number>")
-        raise SystemExit(1)
+    parser = argparse.ArgumentParser(description="Генерация обложки дня через Gemini.")
+    parser.add_argument("day_number", type=int)
+    # salt — принудительно другой вариант промпта (и мимо кэша)
+    parser.add_argument("salt", nargs="?", default="")
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Сколько вариантов запросить параллельно; остаётся лучший по оценке",
+    )
+    args = parser.parse_args()
 
-    day_number = int(sys.argv[1])
-    if day_number < 1:
+    if args.day_number < 1:
         print("day_number должен быть >= 1")
         raise SystemExit(1)
 
-    generate_image(day_number)
+    generate_image(args.day_number, args.salt, args.candidates)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""On-disk conditional cache for YouTube API GET requests.
+
+``CachingHttp`` wraps the httplib2.Http under the client's AuthorizedHttp.
+Responses with an ETag are stored under a hash of the request URL (which
+carries every parameter: part, fields, pageToken...). Within the TTL a
+stored response is served without a request; after it, the request goes out
+with ``If-None-Match`` and a 304 is answered from the cache, so unchanged
+data costs one small round trip. Any non-GET request to the YouTube API
+(insert, update, thumbnail upload) marks every stored entry as stale, also
+for later runs: they are revalidated instead of served blindly. OAuth token
+refreshes (POST to oauth2.googleapis.com) do not count as writes.
+Responses that carry secrets (liveStreams: the RTMP stream key) are never
+written to disk, see UNCACHED_PATHS.
+
+Settings (.env / environment): YT_HTTP_CACHE=0 turns the cache off,
+YT_HTTP_CACHE_TTL (seconds, default 60), YT_HTTP_CACHE_MAX_MB (default 64).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httplib2
+from dotenv import load_dotenv
+
+RUNTIME_DIR = Path(__file__).resolve().parent / "runtime"
+HTTP_CACHE_DIR = RUNTIME_DIR / "http_cache"
+
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+# Вытеснение освобождает место с запасом, чтобы следующие put не сканировали снова
+EVICT_TO_FRACTION = 0.9
+
+# Файл-метка: время последнего запроса на запись через любой клиент
+WRITE_MARKER = "last_write"
+# Хосты данных YouTube API (включая /upload и /batch); не токен-эндпоинт OAuth
+DATA_HOSTS = frozenset({"www.googleapis.com", "youtube.googleapis.com"})
+# Ответы с секретами не кладём на диск: в liveStreams (part=cdn) лежит
+# ключ трансляции. Повторное использование в процессе — yt_stream._INGESTION_CACHE
+UNCACHED_PATHS = ("/youtube/v3/liveStreams",)
+
+
+class CacheStats:
+    """Process-wide counters shared by all clients (one per thread)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"hit": 0, "revalidated": 0, "miss": 0}
+
+    def add(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def summary(self) -> str:
+        """Counters as one line; empty if the cache was not used."""
+        with self._lock:
+            hit, revalidated, miss = (
+                self.counts["hit"], self.counts["revalidated"], self.counts["miss"]
+            )
+        if not hit + revalidated + miss:
+            return ""
+        return f"HTTP cache: {hit} fresh hits, {revalidated} not modified (304), {miss} misses"
+
+
+HTTP_CACHE_STATS = CacheStats()
+
+
+class _CacheRoot:
+    """
+    State shared by every HttpCache on one directory (clients of all
+    threads and accounts): the eviction lock and the running size total.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # None — ещё не посчитано (первый put просканирует каталог)
+        self.total: Optional[int] = None
+
+
+_ROOTS: Dict[Path, _CacheRoot] = {}
+_ROOTS_LOCK = threading.Lock()
+
+
+def _cache_root(root: Path) -> _CacheRoot:
+    with _ROOTS_LOCK:
+        return _ROOTS.setdefault(root.resolve(), _CacheRoot())
+
+
+class HttpCache:
+    """Files ``<root>/<key[:2]>/<key>``: a JSON header line, then the body."""
+
+    def __init__(
+        self,
+        root: Path = HTTP_CACHE_DIR,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        namespace: str = "",
+    ) -> None:
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # Разные аккаунты (token_file) не должны видеть ответы друг друга
+        self.namespace = namespace
+        self._root_state = _cache_root(root)
+
+    def key(self, uri: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{uri}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[Tuple[dict, bytes]]:
+        try:
+            raw = self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        header, _, body = raw.partition(b"\n")
+        try:
+            return json.loads(header), body
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, key: str, meta: dict, body: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(meta).encode("utf-8") + b"\n" + body
+        try:
+            old_size = path.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        state = self._root_state
+        with state.lock:
+            if state.total is not None:
+                state.total += len(data) - old_size
+        # Каталог сканируется только при первом put и при превышении лимита
+        if state.total is None or state.total > self.max_bytes:
+            self.evict()
+
+    def discard(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def is_fresh(self, meta: dict) -> bool:
+        stored_at = meta.get("stored_at", 0)
+        return time.time() - stored_at < self.ttl and stored_at > self.last_write()
+
+    def last_write(self) -> float:
+        try:
+            return (self.root / WRITE_MARKER).stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def mark_write(self) -> None:
+        marker = self.root / WRITE_MARKER
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+
+    def evict(self) -> int:
+        """
+        Remove least recently stored entries until the cache fits in
+        ``EVICT_TO_FRACTION * max_bytes`` (nothing is removed while it is
+        within ``max_bytes``); return count. Rescans the directory and resets
+        the running size total.
+        """
+        state = self._root_state
+        with state.lock:
+            entries = []
+            total = 0
+            for path in self.root.glob("*/*"):
+                if path.suffix == ".tmp":
+                    continue
+                # Файл мог удалить другой процесс или поток
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+            removed = 0
+            target = self.max_bytes * EVICT_TO_FRACTION if total > self.max_bytes else total
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+            state.total = total
+            return removed
+
+
+class CachingHttp:
+    """httplib2.Http look-alike: GETs go through ``cache``, the rest straight through."""
+
+    def __init__(self, http: httplib2.Http, cache: HttpCache) -> None:
+        object.__setattr__(self, "http", http)
+        object.__setattr__(self, "cache", cache)
+
+    # AuthorizedHttp читает и пишет connections/timeout/redirect_codes у
+    # обёрнутого объекта — пробрасываем их в настоящий Http
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def __setattr__(self, name, value) -> None:
+        setattr(self.http, name, value)
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if method != "GET":
+            response, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+            if is_data_write(uri):
+                self.cache.mark_write()
+            return response, content
+
+        key = self.cache.key(uri)
+        if not is_cacheable(uri):
+            # Запись могла остаться от версии, которая кэшировала всё
+            self.cache.discard(key)
+            return self.http.request(uri, method, body=body, headers=headers, **kwargs)
+
+        cached = self.cache.get(key)
+        if cached is not None and self.cache.is_fresh(cached[0]):
+            HTTP_CACHE_STATS.add("hit")
+            return _cached_response(cached[0], "hit"), cached[1]
+
+        headers = dict(headers or {})
+        if cached is not None:
+            headers["if-none-match"] = cached[0]["etag"]
+
+        response, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+
+        if response.status == 304 and cached is not None:
+            HTTP_CACHE_STATS.add("revalidated")
+            meta = dict(cached[0], stored_at=time.time())
+            self.cache.put(key, meta, cached[1])
+            return _cached_response(meta, "revalidated"), cached[1]
+
+        HTTP_CACHE_STATS.add("miss")
+        etag = response.get("etag")
+        if response.status == 200 and etag:
+            meta = {
+                "etag": etag,
+                "stored_at": time.time(),
+                "content-type": response.get("content-type", "application/json"),
+            }
+            self.cache.put(key, meta, content)
+        return response, content
+
+
+def is_data_write(uri: str) -> bool:
+    """True for a non-GET to the YouTube data API, False e.g. for a token refresh."""
+    return urlsplit(uri).hostname in DATA_HOSTS
+
+
+def is_cacheable(uri: str) -> bool:
+    """False for GETs whose responses must not be stored (see UNCACHED_PATHS)."""
+    return not urlsplit(uri).path.startswith(UNCACHED_PATHS)
+
+
+def _cached_response(meta: dict, outcome: str) -> httplib2.Response:
+    response = httplib2.Response({
+        "status": "200",
+        "content-type": meta["content-type"],
+        "etag": meta["etag"],
+        # Служебный заголовок с "-", как "-content-encoding" у httplib2
+        "-cache": outcome,
+    })
+    response.status = 200
+    return response
+
+
+_CACHES: Dict[Tuple[str, float, int], HttpCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def cache_from_env(namespace: str = "") -> Optional[HttpCache]:
+    """
+    HttpCache with settings from .env/environment, or None if disabled.
+    Clients of the same account (one per thread) share one instance.
+    """
+    load_dotenv()
+    if os.environ.get("YT_HTTP_CACHE", "1") == "0":
+        return None
+    try:
+        ttl = float(os.environ.get("YT_HTTP_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        max_mb = float(os.environ.get("YT_HTTP_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 ** 2))
+    except ValueError as e:
+        raise RuntimeError(f"Неверное значение YT_HTTP_CACHE_TTL/YT_HTTP_CACHE_MAX_MB: {e}")
+    max_bytes = int(max_mb * 1024 ** 2)
+    with _CACHES_LOCK:
+        cache = _CACHES.get((namespace, ttl, max_bytes))
+        if cache is None:
+            cache = HttpCache(ttl=ttl, max_bytes=max_bytes, namespace=namespace)
+            _CACHES[(namespace, ttl, max_bytes)] = cache
+        return cache
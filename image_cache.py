@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Content-addressed cache of raw Gemini image outputs.
+
+The key is a hash of everything that determines the model output: model ID,
+prompt text and base image bytes. The raw response bytes are stored before any
+crop or JPEG encoding, so re-running generation after a crash or a change in
+post-processing reuses them instead of paying for another Gemini call.
+Least recently used entries are evicted once the cache exceeds its size cap.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+RUNTIME_DIR = Path(__file__).resolve().parent / "runtime"
+IMAGE_CACHE_DIR = RUNTIME_DIR / "image_cache"
+
+# Размер кэша по умолчанию: ~2 ГБ (≈ 1000 ответов модели)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Вытеснение освобождает место с запасом, чтобы следующие put не сканировали снова
+EVICT_TO_FRACTION = 0.9
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def image_cache_key(
+    model_id: str, prompt: str, base_image_hash: str, candidate: int = 0
+) -> str:
+    """
+    Return the cache key for one generation request. Candidates of the same
+    prompt (see ImageGenerator.generate) get distinct keys; candidate 0 keeps
+    the key used before candidates existed.
+    """
+    h = hashlib.sha256()
+    parts = [model_id, prompt, base_image_hash]
+    if candidate:
+        parts.append(f"candidate:{candidate}")
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ImageCache:
+    """Files ``<root>/<key[:2]>/<key>``; mtime is bumped on every hit (LRU order)."""
+
+    def __init__(
+        self,
+        root: Path = IMAGE_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Текущий размер кэша; None — ещё не посчитан (первый put просканирует)
+        self._total: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Запись могли вытеснить между чтением и utime — ответ всё равно есть
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            old_size = path.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total is not None:
+                self._total += len(data) - old_size
+            total = self._total
+        # Каталог сканируется только при первом put и при превышении лимита
+        if total is None or total > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits in
+        ``EVICT_TO_FRACTION * max_bytes`` (nothing is removed while it is
+        within ``max_bytes``); return count. Rescans the directory and resets
+        the running size total.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.root.glob("*/*"):
+                if path.suffix == ".tmp":
+                    continue
+                # Файл мог удалить другой процесс или поток
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+            removed = 0
+            target = self.max_bytes * EVICT_TO_FRACTION if total > self.max_bytes else total
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+            self._total = total
+            return removed
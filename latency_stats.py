@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Persistent latency histogram for adaptive request hedging.
+
+Latencies go into log-spaced buckets saved as JSON in runtime/, so the
+observed distribution survives across runs. percentile() answers "how long
+do calls usually take" for deciding when to send a duplicate request.
+Once the sample count passes MAX_SAMPLES all counts are halved, so recent
+behaviour of the API outweighs old runs.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+RUNTIME_DIR = Path(__file__).resolve().parent / "runtime"
+GEMINI_LATENCY_FILE = RUNTIME_DIR / "gemini_latency.json"
+
+# Границы корзин: от 0.5 с до ~10 минут, шаг x1.25
+BUCKET_START = 0.5
+BUCKET_FACTOR = 1.25
+BUCKET_COUNT = 45
+
+MAX_SAMPLES = 2000
+
+
+def bucket_bounds() -> List[float]:
+    """Верхние границы корзин (секунды)."""
+    return [round(BUCKET_START * BUCKET_FACTOR ** i, 3) for i in range(BUCKET_COUNT)]
+
+
+class LatencyHistogram:
+    """Thread-safe histogram; every record() is written through to ``path``."""
+
+    def __init__(self, path: Path = GEMINI_LATENCY_FILE) -> None:
+        self.path = path
+        self.bounds = bucket_bounds()
+        self.counts = [0.0] * (len(self.bounds) + 1)  # последняя — всё, что дольше
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        # Другая сетка корзин — старые данные несравнимы, начинаем заново
+        if data.get("bounds") == self.bounds and len(data.get("counts", [])) == len(self.counts):
+            self.counts = [float(c) for c in data["counts"]]
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(
+            json.dumps({"bounds": self.bounds, "counts": self.counts}), encoding="utf-8"
+        )
+        os.replace(tmp_path, self.path)
+
+    @property
+    def total(self) -> float:
+        return sum(self.counts)
+
+    def record(self, seconds: float) -> None:
+        index = len(self.bounds)
+        if seconds <= self.bounds[0]:
+            index = 0
+        elif seconds <= self.bounds[-1]:
+            index = math.ceil(math.log(seconds / BUCKET_START, BUCKET_FACTOR))
+            # Защита от погрешности округления на границе корзины
+            if self.bounds[index] < seconds:
+                index += 1
+        with self._lock:
+            self.counts[index] += 1
+            if self.total > MAX_SAMPLES:
+                self.counts = [c / 2 for c in self.counts]
+            self._save()
+
+    def percentile(self, p: float, min_samples: int = 20) -> Optional[float]:
+        """
+        Верхняя граница корзины, в которую попадает p-й перцентиль, или None,
+        если замеров меньше min_samples (или перцентиль за пределами сетки).
+        """
+        with self._lock:
+            counts = list(self.counts)
+        total = sum(counts)
+        if total < min_samples:
+            return None
+
+        threshold = total * p / 100
+        seen = 0.0
+        for bound, count in zip(self.bounds, counts):
+            seen += count
+            if seen >= threshold:
+                return bound
+        return None
@@ -1,4 +1,5 @@
 from yt_auth import get_youtube_service
+from yt_read import print_read_summary, read_request
 
 SCOPES = [
     "https://www.googleapis.com/auth/youtube",
@@ -7,7 +8,9 @@ SCOPES = [
 
 youtube = get_youtube_service(SCOPES)
 
-resp = youtube.liveStreams().list(
+resp = read_request(
+    youtube.liveStreams(),
+    "liveStreams.keys",
     part="id,snippet,cdn",
     mine=True,
     maxResults=50
@@ -29,3 +32,5 @@ for s in items:
     print(f"URL:   {url}")
     print(f"Key:   {key}")
     print("-" * 40)
+
+print_read_summary()
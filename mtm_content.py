@@ -1,15 +1,46 @@
 """Shared content utilities for Master's Touch Meditation videos/streams."""
+import re
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
 
 # Папка с JPG-обложками
 SEQUENCE_DIR = Path.home() / "projects" / "master_touch_meditation" / "sequence"
 
+# "Day N of 1000" — часть канонического заголовка и всех старых вариантов
+DAY_TITLE_PATTERN = re.compile(r"\bDay\s+(\d+)\s+of\s+1000\b", re.IGNORECASE)
+# "N. Master's Touch Meditation ..." — префикс канонического заголовка
+CANONICAL_PREFIX_PATTERN = re.compile(
+    r"^\s*(\d+)\.\s*Master['’]s Touch Meditation", re.IGNORECASE
+)
+
 
 def build_stream_title(index: int) -> str:
     """Return the canonical title for a meditation day."""
     return f"{index}. Master's Touch Meditation — Day {index} of 1000"
 
 
+def parse_day_number(title: str) -> Optional[int]:
+    """Return the day number encoded in a video/stream title, if any."""
+    match = DAY_TITLE_PATTERN.search(title) or CANONICAL_PREFIX_PATTERN.match(title)
+    if not match:
+        return None
+    return int(match.group(1))
+
+
+def group_by_day(
+    items: Iterable[T], get_title: Callable[[T], str]
+) -> Dict[int, List[T]]:
+    """Parse every title once and group items by day number (input order kept)."""
+    by_day: Dict[int, List[T]] = {}
+    for item in items:
+        day = parse_day_number(get_title(item))
+        if day is not None:
+            by_day.setdefault(day, []).append(item)
+    return by_day
+
+
 def build_stream_description() -> str:
     """Return the canonical description used for all videos/streams."""
     return (
@@ -4,29 +4,41 @@ from __future__ import annotations
 import argparse
 import re
 import sys
-from datetime import date, datetime
-from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
-from googleapiclient.http import MediaFileUpload
 from dotenv import dotenv_values
 
 from day_index import date_to_index
-from generate_image_gemini import generate_image
+from generate_image_gemini import flush_writes, get_image_generator
 from mtm_content import (
     build_stream_description,
     build_stream_title,
     get_thumbnail_path,
+    group_by_day,
 )
-from yt_auth import get_youtube_service
-from yt_stream import SCOPES
+from uploads_index import Upload, UploadsIndex, iter_uploads_since
+from yt_auth import get_youtube_client
+from yt_read import print_read_summary, read_request
+from yt_stream import SCOPES, set_thumbnail
 
-BackupVideo = Tuple[str, str, date, Optional[str]]  # (video_id, title, date, published_at)
-ProcessedVideo = Tuple[str, str, Optional[str]]  # (video_id, title, published_at)
+BackupVideo = Tuple[str, str, date, Optional[datetime]]  # (video_id, title, date, published_at)
+ProcessedVideo = Tuple[str, str, Optional[datetime]]  # (video_id, title, published_at)
+Thumbnail = Tuple[str, Optional[bytes]]  # (path, JPEG-байты, если только что сгенерирована)
 
 
 DATE_TITLE_PATTERN = re.compile(r"^VID[ _]+(\d{8})[ _].+")
 ALT_DATE_TITLE_PATTERN = re.compile(r"([A-Za-z]+ \d{1,2}, \d{4})")
 
+# Резервное видео публикуется в день записи или позже; запас на часовые пояса.
+# Uploads playlist не упорядочен строго по publishedAt (запланированные
+# трансляции и премьеры публикуются позже соседей): более старые видео внутри
+# окна пропускаются, а не обрывают чтение (uploads_index.take_since)
+SAFETY_WINDOW = timedelta(days=2)
+
+# Ключ сортировки для видео без publishedAt (время в записях с таймзоной)
+PUBLISHED_MIN = datetime.min.replace(tzinfo=timezone.utc)
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -57,6 +69,12 @@ def parse_args() -> argparse.Namespace:
         help="Внести реальные изменения на YouTube",
     )
 
+    parser.add_argument(
+        "--full-sync",
+        action="store_true",
+        help="Перестроить локальный индекс uploads playlist с нуля",
+    )
+
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -85,14 +103,6 @@ def get_backup_playlist_id() -> str:
     return playlist_id
 
 
-def get_uploads_playlist_id(youtube) -> str:
-    resp = youtube.channels().list(part="contentDetails", mine=True).execute()
-    items = resp.get("items", [])
-    if not items:
-        raise RuntimeError("Не удалось получить канал (mine=True)")
-    return items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
-
-
 def extract_date_from_title(title: str) -> Optional[date]:
     match = DATE_TITLE_PATTERN.match(title)
     if match:
@@ -113,121 +123,82 @@ def extract_date_from_title(title: str) -> Optional[date]:
     return None
 
 
-def load_uploads_items(youtube, verbose: bool = False) -> List[Dict[str, Any]]:
-    uploads_id = get_uploads_playlist_id(youtube)
-    items: List[Dict[str, Any]] = []
-
-    req = youtube.playlistItems().list(
-        part="snippet,contentDetails",
-        playlistId=uploads_id,
-        maxResults=50,
+def load_uploads_items(
+    youtube,
+    target_date: date,
+    verbose: bool = False,
+    full_sync: bool = False,
+) -> List[Upload]:
+    """
+    Загрузки, опубликованные не раньше target_date - SAFETY_WINDOW (новые первыми).
+    Чтение останавливается после uploads_index.OLDER_RUN_LIMIT более старых видео подряд.
+    """
+    since = datetime.combine(target_date - SAFETY_WINDOW, time.min, tzinfo=timezone.utc)
+    items = list(
+        iter_uploads_since(youtube, since, full_sync=full_sync, verbose=verbose)
     )
 
-    while req is not None:
-        resp = req.execute()
-        batch = resp.get("items", [])
-        items.extend(batch)
-        if verbose:
-            print(f"Загружено {len(items)} элементов uploads playlist...")
-        req = youtube.playlistItems().list_next(
-            previous_request=req, previous_response=resp
-        )
+    if verbose:
+        print(f"Загрузок начиная с {since.date().isoformat()}: {len(items)}.")
 
     return items
 
 
-def to_datetime_or_none(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    try:
-        if value.endswith("Z"):
-            return datetime.fromisoformat(value.replace("Z", "+00:00"))
-        return datetime.fromisoformat(value)
-    except ValueError:
-        return None
+def format_published(value: Optional[datetime]) -> str:
+    return value.isoformat().replace("+00:00", "Z") if value else "—"
 
 
 def find_backup_video(
-    items: List[Dict[str, Any]],
+    items: List[Upload],
     target_date: date,
     verbose: bool = False,
 ) -> Optional[BackupVideo]:
     candidates: List[BackupVideo] = []
 
-    for item in items:
-        snippet = item.get("snippet", {})
-        title = snippet.get("title", "")
+    for video_id, title, published in items:
         parsed_date = extract_date_from_title(title)
         if parsed_date != target_date:
             continue
 
-        video_id = snippet.get("resourceId", {}).get("videoId")
-        if not video_id:
-            continue
-
-        published = (
-            item.get("contentDetails", {}).get("videoPublishedAt")
-            or snippet.get("publishedAt")
-        )
         candidates.append((video_id, title, parsed_date, published))
 
     if not candidates:
         return None
 
-    def sort_key(entry: BackupVideo):
-        _, _, _, published = entry
-        dt = to_datetime_or_none(published)
-        return dt or datetime.min
-
-    candidates.sort(key=sort_key, reverse=True)
+    # publishedAt разобран один раз при чтении записей
+    candidates.sort(key=lambda entry: entry[3] or PUBLISHED_MIN, reverse=True)
     if verbose and len(candidates) > 1:
         print(
             "Найдено несколько резервных видео за дату, выберу самое свежее по publishedAt:"
         )
         for c in candidates:
-            print(f"  • {c[0]} — {c[1]} — {c[3]}")
+            print(f"  • {c[0]} — {c[1]} — {format_published(c[3])}")
 
     return candidates[0]
 
 
 def find_processed_video(
-    items: List[Dict[str, Any]],
+    items_by_day: Dict[int, List[Upload]],
     index: int,
     verbose: bool = False,
 ) -> Optional[ProcessedVideo]:
     title = build_stream_title(index)
-    candidates: List[ProcessedVideo] = []
-
-    for item in items:
-        snippet = item.get("snippet", {})
-        if snippet.get("title") != title:
-            continue
-
-        video_id = snippet.get("resourceId", {}).get("videoId")
-        if not video_id:
-            continue
-
-        published = (
-            item.get("contentDetails", {}).get("videoPublishedAt")
-            or snippet.get("publishedAt")
-        )
-        candidates.append((video_id, title, published))
+    candidates: List[ProcessedVideo] = [
+        (video_id, item_title, published)
+        for video_id, item_title, published in items_by_day.get(index, [])
+        if item_title == title
+    ]
 
     if not candidates:
         return None
 
-    def sort_key(entry: ProcessedVideo):
-        _, _, published = entry
-        dt = to_datetime_or_none(published)
-        return dt or datetime.min
-
-    candidates.sort(key=sort_key, reverse=True)
+    candidates.sort(key=lambda entry: entry[2] or PUBLISHED_MIN, reverse=True)
     if verbose and len(candidates) > 1:
         print(
             "Найдено несколько оформленных видео за дату, выберу самое свежее по publishedAt:"
         )
         for c in candidates:
-            print(f"  • {c[0]} — {c[1]} — {c[2]}")
+            print(f"  • {c[0]} — {c[1]} — {format_published(c[2])}")
 
     return candidates[0]
 
@@ -237,14 +208,14 @@ def print_video_info(video: BackupVideo) -> None:
     print("Найдено резервное видео:")
     print(f"  videoId:     {video_id}")
     print(f"  title:       {old_title}")
-    print(f"  publishedAt: {published}")
+    print(f"  publishedAt: {format_published(published)}")
 
 
-def ensure_thumbnail(index: int, dry_run: bool) -> Optional[str]:
+def ensure_thumbnail(index: int, dry_run: bool) -> Optional[Thumbnail]:
     thumb_path = get_thumbnail_path(index)
 
     if thumb_path.exists():
-        return str(thumb_path)
+        return str(thumb_path), None
 
     print(f"Обложка {thumb_path} отсутствует.")
     if dry_run:
@@ -253,17 +224,14 @@ def ensure_thumbnail(index: int, dry_run: bool) -> Optional[str]:
 
     try:
         print("Генерирую обложку через Gemini…")
-        generate_image(index)
+        # JPEG сразу в памяти; файлы пишутся в фоне (см. flush_writes в main)
+        jpeg_bytes = get_image_generator().generate(index)
     except Exception as e:  # noqa: BLE001
         print(f"Ошибка при генерации обложки: {e}")
         return None
 
-    if thumb_path.exists():
-        print(f"Сгенерированная обложка: {thumb_path}")
-        return str(thumb_path)
-
-    print("После генерации обложка всё ещё не найдена.")
-    return None
+    print(f"Сгенерированная обложка: {thumb_path}")
+    return str(thumb_path), jpeg_bytes
 
 
 def update_video_metadata(
@@ -274,11 +242,9 @@ def update_video_metadata(
     dry_run: bool,
     verbose: bool = False,
 ) -> None:
-    resp = (
-        youtube.videos()
-        .list(part="snippet", id=video_id)
-        .execute()
-    )
+    resp = read_request(
+        youtube.videos(), "videos.snippet", part="snippet", id=video_id
+    ).execute()
     items = resp.get("items", [])
     if not items:
         raise RuntimeError(f"Видео с id={video_id} не найдено")
@@ -312,15 +278,28 @@ def update_video_metadata(
     ).execute()
     print("Snippet обновлён.")
 
+    with UploadsIndex() as index:
+        index.update_title(video_id, new_title)
+
 
-def update_thumbnail(youtube, video_id: str, thumbnail_path: str, dry_run: bool) -> None:
+def update_thumbnail(
+    youtube,
+    video_id: str,
+    thumbnail_path: str,
+    dry_run: bool,
+    thumbnail_bytes: Optional[bytes] = None,
+) -> None:
     print(f"Обновление thumbnail ({thumbnail_path})…")
     if dry_run:
         print("DRY_RUN — thumbnail не загружается.")
         return
 
-    media = MediaFileUpload(thumbnail_path, mimetype="image/jpeg")
-    youtube.thumbnails().set(videoId=video_id, media_body=media).execute()
+    set_thumbnail(
+        youtube,
+        broadcast_id=video_id,
+        thumbnail_path=thumbnail_path,
+        thumbnail_bytes=thumbnail_bytes,
+    )
     print("Thumbnail обновлён.")
 
 
@@ -337,8 +316,10 @@ def add_video_to_playlist(
         return
 
     try:
-        req = youtube.playlistItems().list(
-            part="snippet,contentDetails",
+        req = read_request(
+            youtube.playlistItems(),
+            "playlistItems.videoIds",
+            part="snippet",
             playlistId=playlist_id,
             maxResults=50,
         )
@@ -394,13 +375,15 @@ def main():
         print("Ошибка переменной окружения:", e)
         sys.exit(1)
 
-    youtube = get_youtube_service(SCOPES)
+    youtube = get_youtube_client(SCOPES)
 
     if youtube is None:
         return
 
     try:
-        items = load_uploads_items(youtube, verbose=args.verbose)
+        items = load_uploads_items(
+            youtube, target_date, verbose=args.verbose, full_sync=args.full_sync
+        )
     except Exception as e:  # noqa: BLE001
         print("Ошибка при загрузке списка видео:", e)
         sys.exit(1)
@@ -411,14 +394,18 @@ def main():
         print("Ошибка при вычислении номера дня:", e)
         sys.exit(1)
 
-    processed = find_processed_video(items, index=index, verbose=args.verbose)
+    items_by_day = group_by_day(items, lambda upload: upload.title)
+    processed = find_processed_video(
+        items_by_day, index=index, verbose=args.verbose
+    )
     if processed:
         video_id, processed_title, published_at = processed
         print("Резервное видео за эту дату уже оформлено:")
         print(f"  videoId:     {video_id}")
         print(f"  title:       {processed_title}")
-        print(f"  publishedAt: {published_at}")
+        print(f"  publishedAt: {format_published(published_at)}")
         print("Дальнейшие действия не требуются.")
+        print_read_summary()
         sys.exit(0)
 
     video = find_backup_video(items, target_date, verbose=args.verbose)
@@ -444,13 +431,15 @@ def main():
         verbose=args.verbose,
     )
 
-    thumb_path = ensure_thumbnail(index=index, dry_run=args.dry_run)
-    if thumb_path:
+    thumbnail = ensure_thumbnail(index=index, dry_run=args.dry_run)
+    if thumbnail:
+        thumb_path, thumb_bytes = thumbnail
         update_thumbnail(
             youtube=youtube,
             video_id=video[0],
             thumbnail_path=thumb_path,
             dry_run=args.dry_run,
+            thumbnail_bytes=thumb_bytes,
         )
     else:
         print("Thumbnail не обновлён (файл отсутствует).")
@@ -462,6 +451,10 @@ def main():
         dry_run=args.dry_run,
     )
 
+    # Дожидаемся фоновой записи сгенерированной обложки в SEQUENCE_DIR
+    flush_writes()
+    print_read_summary()
+
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import random
+import threading
 from datetime import date, timedelta
 from pathlib import Path
 
@@ -11,13 +12,6 @@ START_DATE = date(2025, 2, 20)
 SOURCES_DIR = Path(__file__).parent / "sources"
 
 
-def load_variants(filename: str) -> list[str]:
-    """Считывает варианты из текстового файла, по одному на строку."""
-    path = SOURCES_DIR / filename
-    with path.open("r", encoding="utf-8") as f:
-        return [line.strip() for line in f if line.strip()]
-
-
 def get_date_for_day(day_number: int) -> date:
     """Возвращает календарную дату для указанного порядкового номера."""
     if day_number < 1:
@@ -25,57 +19,178 @@ def get_date_for_day(day_number: int) -> date:
     return START_DATE + timedelta(days=day_number - 1)
 
 
-def choose_hair(gender: str) -> str:
-    """Выбор варианта волосяного покрова в зависимости от пола."""
-    if gender == "женский":
-        variants = load_variants("hair_female.txt")
-    else:
-        variants = load_variants("hair_male.txt")
-    return random.choice(variants)
+def uses_sunday_palette(day_number: int) -> bool:
+    """True, если день — воскресенье: палитра всегда SUNDAY_PALETTE."""
+    # Monday=0 ... Sunday=6
+    return get_date_for_day(day_number).weekday() == 6
 
 
-def choose_palette(current_date: date) -> str:
+def day_rng(day_number: int, salt: str = "") -> random.Random:
     """
-    Выбор цветовой палитры:
-    - если воскресенье → всегда 'только красные тона'
-    - иначе случайный вариант из palette.txt
+    Генератор случайных чисел, детерминированный для дня: один и тот же
+    день (и salt) всегда даёт один и тот же промпт. Другой salt — новый вариант.
     """
-    # Monday=0 ... Sunday=6
-    if current_date.weekday() == 6:
-        return "только красные тона"
-
-    variants = load_variants("palette.txt")
-    return random.choice(variants)
-
-
-def generate_prompt(day_number: int) -> str:
-    """Генерирует текст промпта для указанного дня (1–1000)."""
-    current_date = get_date_for_day(day_number)
+    return random.Random(f"mtm-day:{day_number}:{salt}")
 
-    genders = load_variants("genders.txt")
-    styles = load_variants("styles.txt")
-    locations = load_variants("locations.txt")
-    clothes = load_variants("clothes.txt")
 
-    gender = random.choice(genders)
-    style = random.choice(styles)
-    location = random.choice(locations)
-    clothes_choice = random.choice(clothes)
-    hair = choose_hair(gender)
-    palette = choose_palette(current_date)
-
-    prompt = f"""
+PROMPT_TEMPLATE = """
 Перерисовать изображение в стиле: {style}
 Текст: Сохранить арочный заголовок "MASTER'S TOUCH MEDITATION". Добавить под ним четкий подзаголовок "Day {day_number} of 1000". Текст и заголовок должен контрастировать с фоном.
 Пол: {gender}
 Локация: {location}
-Одежда: {clothes_choice}
+Одежда: {clothes}
 Волосяной покров: {hair}
 Цветовая палитра: {palette}
 Ориентация: Альбомная
 """.strip()
 
-    return prompt
+# Фон без подзаголовка: "Day N of 1000" дорисовывается локально
+BACKGROUND_PROMPT_TEMPLATE = """
+Перерисовать изображение в стиле: {style}
+Текст: Сохранить арочный заголовок "MASTER'S TOUCH MEDITATION". Под заголовком оставить спокойную свободную область без какого-либо текста. Заголовок должен контрастировать с фоном.
+Пол: {gender}
+Локация: {location}
+Одежда: {clothes}
+Волосяной покров: {hair}
+Цветовая палитра: {palette}
+Ориентация: Альбомная
+""".strip()
+
+SUNDAY_PALETTE = "только красные тона"
+
+
+class PromptCatalog:
+    """
+    Все файлы вариантов из sources/, прочитанные один раз. Файл
+    перечитывается, только если изменился его mtime.
+    """
+
+    FILES = (
+        "genders.txt",
+        "styles.txt",
+        "locations.txt",
+        "clothes.txt",
+        "hair_female.txt",
+        "hair_male.txt",
+        "palette.txt",
+    )
+
+    def __init__(self, sources_dir: Path = SOURCES_DIR) -> None:
+        self.sources_dir = sources_dir
+        self._variants: dict[str, list[str]] = {}
+        self._mtimes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Перечитывает изменившиеся файлы (один stat на файл)."""
+        with self._lock:
+            for filename in self.FILES:
+                path = self.sources_dir / filename
+                mtime = path.stat().st_mtime_ns
+                if self._mtimes.get(filename) == mtime:
+                    continue
+                with path.open("r", encoding="utf-8") as f:
+                    self._variants[filename] = [
+                        line.strip() for line in f if line.strip()
+                    ]
+                self._mtimes[filename] = mtime
+
+    def _choose_indices(self, day_number: int, salt: str) -> tuple[int, ...]:
+        """Индексы вариантов для дня (см. _pick_indices)."""
+        sunday = uses_sunday_palette(day_number)
+        return self._pick_indices(day_rng(day_number, salt), sunday)
+
+    def _pick_indices(self, rng: random.Random, sunday: bool) -> tuple[int, ...]:
+        """
+        Индексы (gender, style, location, clothes, hair, palette).
+        Порядок обращений к rng фиксирован — от него зависит результат.
+        palette = -1 означает воскресную палитру.
+        """
+        v = self._variants
+
+        gender_i = rng.randrange(len(v["genders.txt"]))
+        style_i = rng.randrange(len(v["styles.txt"]))
+        location_i = rng.randrange(len(v["locations.txt"]))
+        clothes_i = rng.randrange(len(v["clothes.txt"]))
+        hair_file = _hair_file(v["genders.txt"][gender_i])
+        hair_i = rng.randrange(len(v[hair_file]))
+
+        if sunday:
+            palette_i = -1
+        else:
+            palette_i = rng.randrange(len(v["palette.txt"]))
+
+        return gender_i, style_i, location_i, clothes_i, hair_i, palette_i
+
+    def _render(
+        self,
+        day_number: int,
+        indices: tuple[int, ...],
+        template: str = PROMPT_TEMPLATE,
+    ) -> str:
+        v = self._variants
+        gender_i, style_i, location_i, clothes_i, hair_i, palette_i = indices
+        gender = v["genders.txt"][gender_i]
+
+        return template.format(
+            day_number=day_number,
+            style=v["styles.txt"][style_i],
+            gender=gender,
+            location=v["locations.txt"][location_i],
+            clothes=v["clothes.txt"][clothes_i],
+            hair=v[_hair_file(gender)][hair_i],
+            palette=SUNDAY_PALETTE if palette_i < 0 else v["palette.txt"][palette_i],
+        )
+
+    def generate_prompt(self, day_number: int, salt: str = "") -> str:
+        self.refresh()
+        return self._render(day_number, self._choose_indices(day_number, salt))
+
+    def generate_prompts(
+        self, start: int, end: int, salt: str = ""
+    ) -> dict[int, str]:
+        """
+        Промпты для дней start..end включительно за один проход: файлы
+        проверяются один раз, затем считаются массивы индексов для всех дней.
+        """
+        self.refresh()
+        days = range(start, end + 1)
+        indices = [self._choose_indices(day, salt) for day in days]
+        return {day: self._render(day, idx) for day, idx in zip(days, indices)}
+
+    def generate_background_prompt(
+        self, seed: int, sunday: bool = False, salt: str = ""
+    ) -> str:
+        """Промпт фона без подзаголовка дня (для пула фонов, см. day_text_renderer)."""
+        self.refresh()
+        rng = random.Random(f"mtm-background:{seed}:{sunday}:{salt}")
+        indices = self._pick_indices(rng, sunday)
+        return self._render(0, indices, BACKGROUND_PROMPT_TEMPLATE)
+
+
+def _hair_file(gender: str) -> str:
+    return "hair_female.txt" if gender == "женский" else "hair_male.txt"
+
+
+_CATALOG = PromptCatalog()
+
+
+def generate_prompt(day_number: int, salt: str = "") -> str:
+    """
+    Генерирует текст промпта для указанного дня (1–1000).
+    Результат детерминирован по (day_number, salt), см. day_rng.
+    """
+    return _CATALOG.generate_prompt(day_number, salt)
+
+
+def generate_background_prompt(seed: int, sunday: bool = False, salt: str = "") -> str:
+    """Промпт фона без подзаголовка дня (см. PromptCatalog.generate_background_prompt)."""
+    return _CATALOG.generate_background_prompt(seed, sunday, salt)
+
+
+def generate_prompts(start: int, end: int, salt: str = "") -> dict[int, str]:
+    """Промпты для диапазона дней start..end (см. PromptCatalog.generate_prompts)."""
+    return _CATALOG.generate_prompts(start, end, salt)
 
 if __name__ == "__main__":
     import sys
@@ -89,9 +204,11 @@ if __name__ == "__main__":
             if day_number < 1:
                 raise ValueError
         except ValueError:
-            print("Использование: python prompt_generator.py [day_number>=1]")
+            print("Использование: python prompt_generator.py [day_number>=1] [salt]")
             sys.exit(1)
     else:
         day_number = default_day
 
-    print(generate_prompt(day_number))
+    salt = sys.argv[2] if len(sys.argv) > 2 else ""
+
+    print(generate_prompt(day_number, salt))
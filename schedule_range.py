@@ -1,23 +1,41 @@
 #!/usr/bin/env python3
 import sys
 import os
+import io
 import argparse
+import threading
+import time
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import date
+from typing import Iterator, Optional
 
 from dotenv import load_dotenv
 from yt_stream import schedule_stream, SCOPES as YT_SCOPES
-from yt_auth import get_youtube_service
-from generate_image_gemini import generate_image
+from yt_auth import get_youtube_client
+from yt_batch import YouTubeBatch
+from yt_read import print_read_summary
+from generate_image_gemini import (
+    CALL_DEADLINE_SECONDS,
+    HEDGE_PERCENTILE,
+    ImageBudgetExceeded,
+    flush_writes,
+    get_image_generator,
+)
+from day_text_renderer import render_day_thumbnail
+from gemini_batch import generate_batch
 from day_index import index_to_date
+from uploads_index import UploadsIndex
+from asset_manifest import load_asset_manifest
 from mtm_content import (
     build_stream_description,
     build_stream_title,
     get_thumbnail_path,
+    group_by_day,
 )
 
 
-
 load_dotenv()
 
 # ---------------------------------------------------------
@@ -31,6 +49,15 @@ GENERAL_PLAYLIST_ID = os.getenv("GENERAL_YT_PLAYLIST_ID")
 HALF_PLAYLIST_ID = os.getenv("HALF_MTM_PLAYLIST_ID")
 FULL_PLAYLIST_ID = os.getenv("FULL_MTM_PLAYLIST_ID")
 
+# Флаги, которые действуют только в --thumbnail-mode gemini
+GEMINI_CALL_FLAGS = (
+    "--gemini-concurrency",
+    "--candidates",
+    "--gemini-deadline",
+    "--hedge-percentile",
+    "--image-budget",
+)
+
 
 # ---------------------------------------------------------
 # ПРОСТЫЕ ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
@@ -72,41 +99,12 @@ def choose_playlists_for_date(d: date) -> list[tuple[str, str]]:
 # ПОЛУЧЕНИЕ СПИСКА ВСЕХ ВИДЕО/СТРИМОВ (UPLOADS PLAYLIST)
 # ---------------------------------------------------------
 
-def get_uploads_playlist_id(youtube) -> str:
-    resp = youtube.channels().list(
-        part="contentDetails",
-        mine=True
-    ).execute()
-
-    items = resp.get("items", [])
-    if not items:
-        raise RuntimeError("Не удалось получить канал (mine=True).")
-
-    return items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
-
-
-def load_existing_titles_from_uploads(youtube) -> list[str]:
-    uploads_id = get_uploads_playlist_id(youtube)
-    titles = []
+def load_existing_titles_from_uploads(youtube, full_sync: bool = False) -> list[str]:
+    with UploadsIndex() as index:
+        added = index.sync(youtube, full=full_sync)
+        titles = index.titles()
 
-    req = youtube.playlistItems().list(
-        part="snippet",
-        playlistId=uploads_id,
-        maxResults=50,
-    )
-
-    while req is not None:
-        resp = req.execute()
-        for item in resp.get("items", []):
-            snippet = item.get("snippet", {})
-            title = snippet.get("title")
-            if title:
-                titles.append(title)
-
-        req = youtube.playlistItems().list_next(
-            previous_request=req,
-            previous_response=resp
-        )
+    print(f"Uploads index: новых элементов {added}.")
 
     if VERBOSE_EXISTING:
         print(f"Загружено {len(titles)} видео/стримов:")
@@ -118,14 +116,12 @@ def load_existing_titles_from_uploads(youtube) -> list[str]:
     return titles
 
 
-def day_already_has_stream(index: int, existing_titles: list[str]) -> bool:
-    key = f"Day {index} of 1000"
-
-    matches = [t for t in existing_titles if key in t]
+def day_already_has_stream(index: int, titles_by_day: dict[int, list[str]]) -> bool:
+    matches = titles_by_day.get(index, [])
 
     if matches:
         if VERBOSE_EXISTING:
-            print(f"[{index}] Уже есть стримы с '{key}':")
+            print(f"[{index}] Уже есть стримы с 'Day {index} of 1000':")
             for t in matches:
                 print("      →", t)
         else:
@@ -135,6 +131,24 @@ def day_already_has_stream(index: int, existing_titles: list[str]) -> bool:
     print(f"[{index}] Стрима для этого дня нет.")
     return False
 
+
+def flush_playlist_batch(batch: YouTubeBatch, scheduled_days: dict[str, int]) -> None:
+    """Выполняет отложенные добавления в плейлисты и печатает итог по дням."""
+    queued = len(batch)
+    print(f"Отправляю {queued} добавлений в плейлисты batch-запросами…")
+
+    failed = 0
+    for (broadcast_id, alias), _, error in batch.execute():
+        index = scheduled_days.get(broadcast_id, "?")
+        if error is not None:
+            failed += 1
+            print(f"[{index}] ОШИБКА добавления в плейлист {alias}: {error}")
+        elif VERBOSE_EXISTING:
+            print(f"[{index}] Добавлено в плейлист {alias}.")
+
+    print(f"Плейлисты: успешно {queued - failed}, ошибок {failed}.\n")
+
+
 def parse_args():
     parser = argparse.ArgumentParser(
         description=(
@@ -175,6 +189,98 @@ def parse_args():
         help="Показывать подробную информацию о уже существующих стримах",
     )
 
+    parser.add_argument(
+        "--full-sync",
+        action="store_true",
+        help=(
+            "Rebuild the local uploads index from scratch instead of fetching"
+            " only new uploads (use after deleting/renaming old videos)."
+        ),
+    )
+
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=(
+            "Collect playlist inserts for all days and send them as batch"
+            " requests (up to 50 calls per HTTP round trip) after the loop."
+        ),
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Process N days concurrently (each worker thread gets its own"
+            " YouTube HTTP transport). Output stays grouped per day, in order."
+        ),
+    )
+
+    parser.add_argument(
+        "--gemini-concurrency",
+        type=int,
+        default=3,
+        help=(
+            "How many thumbnails to generate in parallel during the prefetch"
+            " phase that runs before any YouTube writes (default: 3)."
+        ),
+    )
+
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help=(
+            "Request K thumbnail variants per day in parallel and keep the one"
+            " with the best local score (sharpness, title contrast, 16:9 fit,"
+            " red on Sundays). Costs K Gemini calls per day (default: 1)."
+        ),
+    )
+
+    parser.add_argument(
+        "--gemini-deadline",
+        type=float,
+        default=CALL_DEADLINE_SECONDS,
+        help=(
+            "Give up on a single Gemini call after this many seconds"
+            f" (default: {CALL_DEADLINE_SECONDS:.0f})."
+        ),
+    )
+
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=HEDGE_PERCENTILE,
+        help=(
+            "Send a duplicate Gemini request when the first one is slower than"
+            " this percentile of latencies seen in previous runs"
+            f" (default: {HEDGE_PERCENTILE:.0f}, 0 disables)."
+        ),
+    )
+
+    parser.add_argument(
+        "--image-budget",
+        type=float,
+        default=None,
+        help=(
+            "Total seconds for thumbnail generation in this run; days not"
+            " generated in time are skipped (not scheduled)."
+        ),
+    )
+
+    parser.add_argument(
+        "--thumbnail-mode",
+        choices=["gemini", "batch", "local"],
+        default="gemini",
+        help=(
+            "How missing thumbnails are made: 'gemini' generates each day with"
+            " Gemini, 'batch' sends all missing days as Gemini batch jobs and"
+            " waits for them (cheaper, can take long), 'local' draws 'Day N of 1000' over a background from the"
+            " pool (see day_text_renderer.py refresh) with no API calls."
+        ),
+    )
+
     parser.add_argument(
         "--stream-mode",
         choices=["persistent", "unique"],
@@ -196,7 +302,268 @@ def parse_args():
         ),
     )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    # Эти флаги управляют только прямыми запросами к Gemini — в режимах
+    # batch и local они ничего не делают, поэтому не принимаем их молча
+    if args.thumbnail_mode != "gemini":
+        ignored = [
+            flag
+            for flag in GEMINI_CALL_FLAGS
+            if getattr(args, flag[2:].replace("-", "_"))
+            != parser.get_default(flag[2:].replace("-", "_"))
+        ]
+        if ignored:
+            parser.error(
+                f"{', '.join(ignored)} only apply to --thumbnail-mode gemini,"
+                f" not {args.thumbnail_mode}"
+            )
+
+    return args
+
+
+# ---------------------------------------------------------
+# ПРЕДВАРИТЕЛЬНАЯ ГЕНЕРАЦИЯ ОБЛОЖЕК
+# ---------------------------------------------------------
+
+def prefetch_thumbnails(
+    days: range,
+    titles_by_day: dict[int, list[str]],
+    args: argparse.Namespace,
+) -> dict[int, bytes]:
+    """
+    Генерирует все недостающие обложки диапазона параллельно (не больше
+    --gemini-concurrency запросов к Gemini одновременно) до начала работы
+    с YouTube. Возвращает JPEG-байты созданных обложек: они загружаются
+    в YouTube прямо из памяти, пока файлы пишутся на диск в фоне.
+    Дни, не успевшие в --image-budget, пропускаются.
+    """
+    # Один scandir по SEQUENCE_DIR вместо exists() для каждого дня
+    missing = [
+        index
+        for index in load_asset_manifest().missing_days(days.start, days.stop - 1)
+        if index not in titles_by_day
+    ]
+
+    if not missing:
+        print("Все нужные обложки уже есть.\n")
+        return {}
+
+    print(f"Нет обложек для {len(missing)} дн.: {', '.join(map(str, missing))}")
+    if args.dry_run:
+        print("DRY_RUN — генерация обложек пропущена.\n")
+        return {}
+
+    if args.thumbnail_mode == "local":
+        return render_thumbnails_locally(missing)
+
+    if args.thumbnail_mode == "batch":
+        print("Генерирую через Gemini batch-задания…")
+    else:
+        print(f"Генерирую через Gemini (одновременно до {args.gemini_concurrency})…")
+    try:
+        generator = get_image_generator()
+    except Exception as e:  # noqa: BLE001
+        print(f"ОШИБКА инициализации Gemini: {e}. Генерация пропущена.\n")
+        return {}
+    generator.call_deadline = args.gemini_deadline
+    generator.hedge_percentile = args.hedge_percentile or None
+
+    started = time.monotonic()
+    done = 0
+
+    def report(index: int, error: Optional[Exception]) -> None:
+        nonlocal done
+        done += 1
+        if error is None:
+            status = "готово"
+        elif isinstance(error, ImageBudgetExceeded):
+            status = f"пропуск ({error})"
+        else:
+            status = f"ОШИБКА: {error}"
+        elapsed = time.monotonic() - started
+        print(f"  [{done}/{len(missing)}] день {index}: {status} ({elapsed:.0f} с)")
+
+    if args.thumbnail_mode == "batch":
+        results = generate_batch(missing, generator=generator, on_done=report)
+    else:
+        results = generator.generate_many(
+            missing,
+            concurrency=args.gemini_concurrency,
+            on_done=report,
+            budget=args.image_budget,
+            candidates=args.candidates,
+        )
+    thumbnails = {
+        index: result for index, result in results.items() if isinstance(result, bytes)
+    }
+    skipped = sum(
+        isinstance(result, ImageBudgetExceeded) for result in results.values()
+    )
+    failed = len(missing) - len(thumbnails) - skipped
+
+    summary = f"Обложки: создано {len(thumbnails)}, ошибок {failed}"
+    if skipped:
+        summary += f", пропущено по бюджету времени {skipped}"
+    print(summary + ".\n")
+    return thumbnails
+
+
+def render_thumbnails_locally(missing: list[int]) -> dict[int, bytes]:
+    """Рисует обложки поверх пула фонов (без Gemini)."""
+    print("Рисую локально поверх пула фонов…")
+    thumbnails: dict[int, bytes] = {}
+    for index in missing:
+        try:
+            thumbnails[index] = render_day_thumbnail(index)
+        except (RuntimeError, OSError) as e:
+            # OSError — в т.ч. битый фон из пула (PIL.UnidentifiedImageError)
+            print(f"  день {index}: ОШИБКА: {e}")
+    failed = len(missing) - len(thumbnails)
+
+    print(f"Обложки: создано {len(thumbnails)}, ошибок {failed}.\n")
+    return thumbnails
+
+
+# ---------------------------------------------------------
+# ОБРАБОТКА ОДНОГО ДНЯ
+# ---------------------------------------------------------
+
+def schedule_day(
+    index: int,
+    args: argparse.Namespace,
+    titles_by_day: dict[int, list[str]],
+    batch: Optional[YouTubeBatch] = None,
+    thumbnails: Optional[dict[int, bytes]] = None,
+) -> Optional[str]:
+    """Проверяет и при необходимости создаёт стрим дня. Возвращает broadcast_id."""
+
+    # 1) Проверка существования
+    if day_already_has_stream(index, titles_by_day):
+        print(f"[{index}] Пропуск.\n")
+        return None
+
+    # 2) Данные нового дня
+    d = index_to_date(index)
+    start_time = date_to_start_time_rfc3339(d)
+    thumb_path = get_thumbnail_path(index)
+    thumb_bytes = (thumbnails or {}).get(index)
+
+    # Обложки генерируются заранее в prefetch_thumbnails()
+    if thumb_bytes is None and not thumb_path.exists():
+        if args.dry_run:
+            # В DRY_RUN режиме не тратим запросы к Gemini, просто сообщаем
+            print(f"[{index}] Нет обложки {thumb_path}. DRY_RUN — не генерирую, пропуск.\n")
+        else:
+            print(f"[{index}] Нет обложки {thumb_path} (генерация не удалась). Пропуск.\n")
+        return None
+
+    playlists = choose_playlists_for_date(d)
+
+    print(f"\n[{index}] Нужно создать стрим:")
+    print(f"    Дата:       {d.isoformat()}")
+    print(f"    Старт:      {start_time}")
+    print(f"    Обложка:    {thumb_path}")
+    print( "    Плейлисты:")
+    for _, alias in playlists:
+        print(f"      • {alias}")
+
+    title = build_stream_title(index)
+    description = build_stream_description()
+
+    if args.dry_run:
+        print(f"[{index}] DRY_RUN: стрим НЕ создаю.\n")
+        return None
+
+    # 3) СОЗДАНИЕ стрима (клиент свой для каждого потока, см. get_youtube_client)
+    try:
+        result = schedule_stream(
+            title=title,
+            description=description,
+            start_time_rfc3339=start_time,
+            thumbnail_path=str(thumb_path),
+            playlist_ids=playlists,
+            use_persistent_stream=args.stream_mode == "persistent",
+            enable_auto_start=args.auto_start_stop,
+            enable_auto_stop=args.auto_start_stop,
+            youtube=get_youtube_client(YT_SCOPES),
+            batch=batch,
+            thumbnail_bytes=thumb_bytes,
+        )
+    except Exception as e:
+        print(f"[{index}] ОШИБКА при создании стрима:", e, "\n")
+        return None
+
+    print(f"[{index}] Создан:")
+    print("    watch URL:", result["watch_url"])
+    print("    RTMP URL: ", result["rtmp_url"])
+    print("    Stream Key:", result["stream_key"])
+    print()
+    return result["broadcast_id"]
+
+
+class ThreadBufferedStdout:
+    """
+    Подмена sys.stdout: пока поток внутри capture(), его print() пишутся
+    в собственный буфер, остальные потоки пишут как обычно.
+    """
+
+    def __init__(self, target) -> None:
+        self._target = target
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self._target).write(text)
+
+    def flush(self) -> None:
+        self._target.flush()
+
+    @contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        self._local.buffer = io.StringIO()
+        try:
+            yield self._local.buffer
+        finally:
+            self._local.buffer = None
+
+
+def schedule_days_concurrently(
+    days: range,
+    args: argparse.Namespace,
+    titles_by_day: dict[int, list[str]],
+    batch: Optional[YouTubeBatch],
+    thumbnails: dict[int, bytes],
+) -> Iterator[tuple[int, Optional[str]]]:
+    """
+    Обрабатывает дни в пуле из args.workers потоков. Вывод каждого дня
+    собирается отдельно и печатается целиком в порядке дней.
+    """
+    real_stdout = sys.stdout
+    buffered = ThreadBufferedStdout(real_stdout)
+
+    def worker(index: int) -> tuple[Optional[str], str]:
+        with buffered.capture() as out:
+            try:
+                broadcast_id = schedule_day(
+                    index, args, titles_by_day, batch, thumbnails
+                )
+            except Exception as e:  # noqa: BLE001
+                print(f"[{index}] ОШИБКА: {e}. Пропуск.\n")
+                broadcast_id = None
+        return broadcast_id, out.getvalue()
+
+    sys.stdout = buffered
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = [(index, pool.submit(worker, index)) for index in days]
+            for index, future in futures:
+                broadcast_id, output = future.result()
+                real_stdout.write(output)
+                real_stdout.flush()
+                yield index, broadcast_id
+    finally:
+        sys.stdout = real_stdout
 
 
 # ---------------------------------------------------------
@@ -223,83 +590,46 @@ def main():
     print(f"VERBOSE_EXISTING = {VERBOSE_EXISTING}")
     print(f"STREAM_MODE = {args.stream_mode}")
     print(f"AUTO_START_STOP = {args.auto_start_stop}")
+    print(f"WORKERS = {args.workers}")
+    print(f"GEMINI_CONCURRENCY = {args.gemini_concurrency}")
 
-    youtube = get_youtube_service(YT_SCOPES)
-    existing_titles = load_existing_titles_from_uploads(youtube)
-
-    use_persistent = args.stream_mode == "persistent"
-
-    for index in range(start, end + 1):
-
-        # 1) Проверка существования
-        if day_already_has_stream(index, existing_titles):
-            print(f"[{index}] Пропуск.\n")
-            continue
-
-        # 2) Данные нового дня
-        d = index_to_date(index)
-        start_time = date_to_start_time_rfc3339(d)
-        thumb_path = get_thumbnail_path(index)
-
-        # Если обложки нет — пробуем сгенерировать
-        if not thumb_path.exists():
-            if DRY_RUN:
-                # В DRY_RUN режиме не тратим запросы к Gemini, просто сообщаем
-                print(f"[{index}] Нет обложки {thumb_path}. DRY_RUN — не генерирую, пропуск.\n")
-                continue
-
-            print(f"[{index}] Нет обложки {thumb_path}, генерирую через Gemini...")
-
-            try:
-                generate_image(index)
-            except Exception as e:
-                print(f"[{index}] ОШИБКА при генерации обложки: {e}. Пропуск.\n")
-                continue
+    youtube = get_youtube_client(YT_SCOPES)
+    if youtube is None:
+        print("YouTube клиент не создан (токен отозван) — выход.")
+        sys.exit(1)
 
-            # На всякий случай проверим ещё раз, что файл появился
-            if not thumb_path.exists():
-                print(f"[{index}] После генерации обложка {thumb_path} не найдена. Пропуск.\n")
-                continue
+    existing_titles = load_existing_titles_from_uploads(
+        youtube, full_sync=args.full_sync
+    )
+    titles_by_day = group_by_day(existing_titles, lambda title: title)
 
+    batch = YouTubeBatch(youtube) if args.batch else None
+    # broadcast_id -> index дня, чтобы сопоставить результаты batch с днями
+    scheduled_days: dict[str, int] = {}
 
-        playlists = choose_playlists_for_date(d)
+    days = range(start, end + 1)
+    thumbnails = prefetch_thumbnails(days, titles_by_day, args)
 
-        print(f"\n[{index}] Нужно создать стрим:")
-        print(f"    Дата:       {d.isoformat()}")
-        print(f"    Старт:      {start_time}")
-        print(f"    Обложка:    {thumb_path}")
-        print( "    Плейлисты:")
-        for _, alias in playlists:
-            print(f"      • {alias}")
+    if args.workers > 1:
+        results = schedule_days_concurrently(
+            days, args, titles_by_day, batch, thumbnails
+        )
+    else:
+        results = (
+            (index, schedule_day(index, args, titles_by_day, batch, thumbnails))
+            for index in days
+        )
 
-        title = build_stream_title(index)
-        description = build_stream_description()
+    for index, broadcast_id in results:
+        if broadcast_id:
+            scheduled_days[broadcast_id] = index
 
-        if DRY_RUN:
-            print(f"[{index}] DRY_RUN: стрим НЕ создаю.\n")
-            continue
+    if batch is not None and len(batch):
+        flush_playlist_batch(batch, scheduled_days)
 
-        # 3) СОЗДАНИЕ стрима
-        try:
-            result = schedule_stream(
-                title=title,
-                description=description,
-                start_time_rfc3339=start_time,
-                thumbnail_path=str(thumb_path),
-                playlist_ids=playlists,
-                use_persistent_stream=use_persistent,
-                enable_auto_start=args.auto_start_stop,
-                enable_auto_stop=args.auto_start_stop,
-            )
-        except Exception as e:
-            print(f"[{index}] ОШИБКА при создании стрима:", e, "\n")
-            continue
-
-        print(f"[{index}] Создан:")
-        print("    watch URL:", result["watch_url"])
-        print("    RTMP URL: ", result["rtmp_url"])
-        print("    Stream Key:", result["stream_key"])
-        print()
+    # Дожидаемся фоновой записи сгенерированных обложек в SEQUENCE_DIR
+    flush_writes()
+    print_read_summary()
 
 
 if __name__ == "__main__":
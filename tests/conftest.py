@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Модули проекта лежат в корне репозитория, как и для скриптов из utils/
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,40 @@
+import os
+
+from http_cache import EVICT_TO_FRACTION, HttpCache, is_cacheable, is_data_write
+
+META = {"etag": '"x"', "stored_at": 0, "content-type": "application/json"}
+
+
+def test_evicts_oldest_entries_down_to_fraction(tmp_path):
+    cache = HttpCache(root=tmp_path, max_bytes=10_000)
+    keys = [cache.key(f"https://youtube.googleapis.com/youtube/v3/videos?id={i}") for i in range(12)]
+    for n, key in enumerate(keys):
+        cache.put(key, META, b"x" * 1000)
+        # Разные mtime, чтобы порядок LRU был однозначным
+        path = cache._path(key)
+        os.utime(path, (n, n))
+
+    cache.put(keys[-1], META, b"x" * 1000)  # снова над лимитом -> вытеснение
+    sizes = [p.stat().st_size for p in tmp_path.glob("*/*")]
+    assert sum(sizes) <= 10_000 * EVICT_TO_FRACTION
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) is not None
+
+
+def test_running_total_matches_disk(tmp_path):
+    cache = HttpCache(root=tmp_path, max_bytes=1_000_000)
+    for i in range(5):
+        cache.put(cache.key(str(i)), META, b"y" * 100)
+    cache.put(cache.key("0"), META, b"y" * 10)  # перезапись уменьшает размер
+    on_disk = sum(p.stat().st_size for p in tmp_path.glob("*/*"))
+    assert cache._root_state.total == on_disk
+
+
+def test_token_refresh_is_not_a_write():
+    assert not is_data_write("https://oauth2.googleapis.com/token")
+    assert is_data_write("https://www.googleapis.com/upload/youtube/v3/thumbnails/set")
+
+
+def test_stream_keys_are_not_cached():
+    assert not is_cacheable("https://youtube.googleapis.com/youtube/v3/liveStreams?part=cdn")
+    assert is_cacheable("https://youtube.googleapis.com/youtube/v3/liveBroadcasts?part=id")
@@ -0,0 +1,29 @@
+from latency_stats import LatencyHistogram
+
+
+def test_percentile_needs_min_samples(tmp_path):
+    hist = LatencyHistogram(tmp_path / "latency.json")
+    for _ in range(5):
+        hist.record(1.0)
+    assert hist.percentile(95) is None
+
+
+def test_percentile_returns_bucket_upper_bound(tmp_path):
+    hist = LatencyHistogram(tmp_path / "latency.json")
+    for _ in range(90):
+        hist.record(1.0)
+    for _ in range(10):
+        hist.record(30.0)
+
+    p50 = hist.percentile(50)
+    p95 = hist.percentile(95)
+    assert 1.0 <= p50 < 1.25
+    assert 30.0 <= p95 < 30.0 * 1.25
+
+
+def test_histogram_survives_reload(tmp_path):
+    path = tmp_path / "latency.json"
+    hist = LatencyHistogram(path)
+    for _ in range(20):
+        hist.record(2.0)
+    assert LatencyHistogram(path).percentile(50) == hist.percentile(50)
@@ -0,0 +1,27 @@
+from mtm_content import build_stream_title, group_by_day, parse_day_number
+
+
+def test_parse_day_number_canonical_title():
+    assert parse_day_number(build_stream_title(305)) == 305
+
+
+def test_parse_day_number_old_variants():
+    assert parse_day_number("Day 42 of 1000 — утренняя практика") == 42
+    assert parse_day_number("day  7  OF 1000") == 7
+    assert parse_day_number("12. Master’s Touch Meditation") == 12
+
+
+def test_parse_day_number_no_day():
+    assert parse_day_number("Backup stream 2025-03-01") is None
+    assert parse_day_number("Day 5 of 100") is None
+
+
+def test_group_by_day_keeps_input_order_and_skips_unknown():
+    items = [
+        ("a", "Day 3 of 1000"),
+        ("b", "no day here"),
+        ("c", build_stream_title(3)),
+        ("d", "Day 4 of 1000"),
+    ]
+    by_day = group_by_day(items, lambda item: item[1])
+    assert by_day == {3: [items[0], items[2]], 4: [items[3]]}
@@ -0,0 +1,92 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from thumbnail_image import (
+    THUMBNAIL_SIZE,
+    _jpeg_size,
+    content_bounds,
+    crop_to_16x9,
+    encode_jpeg_within_budget,
+    read_image_size,
+)
+
+
+def noise_image(width, height, mean=128.0, seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = np.clip(rng.normal(mean, 40, (height, width)), 0, 255)
+    return pixels
+
+
+def to_image(pixels):
+    return Image.fromarray(pixels.astype(np.uint8)).convert("RGB")
+
+
+@pytest.mark.parametrize("options", [{}, {"progressive": True}])
+def test_read_image_size_jpeg_header(tmp_path, options):
+    path = tmp_path / "a.jpg"
+    Image.new("RGB", (321, 123), (10, 20, 30)).save(path, "JPEG", **options)
+    assert read_image_size(path) == (321, 123)
+    with open(path, "rb") as f:
+        assert _jpeg_size(f) == (321, 123)
+
+
+def test_read_image_size_png_and_other(tmp_path):
+    png = tmp_path / "a.png"
+    Image.new("RGB", (64, 48)).save(png)
+    assert read_image_size(png) == (64, 48)
+
+    bmp = tmp_path / "a.bmp"
+    Image.new("RGB", (17, 9)).save(bmp)
+    assert read_image_size(bmp) == (17, 9)
+
+
+def test_encode_within_budget_downscales_and_fits():
+    img = to_image(noise_image(1600, 900))
+    encoded = encode_jpeg_within_budget(img, max_bytes=300_000)
+    assert encoded.size == THUMBNAIL_SIZE
+    assert len(encoded.data) <= 300_000
+    assert encoded.quality < 95
+    assert encoded.reference_bytes is None
+    assert Image.open(BytesIO(encoded.data)).size == THUMBNAIL_SIZE
+
+
+def test_encode_within_budget_shrinks_when_min_quality_does_not_fit():
+    img = to_image(noise_image(1600, 900))
+    encoded = encode_jpeg_within_budget(img, max_bytes=60_000)
+    assert len(encoded.data) <= 60_000
+    assert encoded.size[0] < THUMBNAIL_SIZE[0]
+
+
+def test_encode_within_budget_measures_savings_on_request():
+    img = to_image(noise_image(1600, 900))
+    encoded = encode_jpeg_within_budget(img, measure_savings=True)
+    assert encoded.reference_bytes > len(encoded.data)
+    assert encoded.bytes_saved == encoded.reference_bytes - len(encoded.data)
+
+
+@pytest.mark.parametrize("bar_value", [0, 255])
+def test_content_bounds_letterbox(bar_value):
+    pixels = noise_image(1280, 1024)
+    pixels[:150] = bar_value
+    pixels[-150:] = bar_value
+    left, top, right, bottom = content_bounds(to_image(pixels))
+    assert (left, right) == (0, 1280)
+    # Ни одной строки поля внутри, содержимое теряется не больше чем на строку анализа
+    assert 150 <= top <= 160
+    assert 864 <= bottom <= 874
+
+
+def test_content_bounds_keeps_flat_sky():
+    pixels = noise_image(1366, 768, mean=150)
+    pixels[:115] = np.linspace(170, 178, 115)[:, None]
+    img = to_image(pixels)
+    assert content_bounds(img) == (0, 0, 1366, 768)
+    assert crop_to_16x9(img).size == (1366, 768)
+
+
+def test_crop_to_16x9_leaves_exact_frame_alone():
+    img = to_image(noise_image(1280, 720))
+    assert crop_to_16x9(img) is img
@@ -0,0 +1,95 @@
+from uploads_index import UploadsIndex
+
+
+class FakeRequest:
+    def __init__(self, execute):
+        self._execute = execute
+        self.headers = {}
+        self.postproc = lambda resp, content: content
+        self.page_token = None
+
+    def execute(self):
+        return self._execute(self.page_token)
+
+
+class FakePlaylistItems:
+    def __init__(self, youtube):
+        self.youtube = youtube
+
+    def list(self, **params):
+        return FakeRequest(self.youtube.page)
+
+    def list_next(self, previous_request, previous_response):
+        token = previous_response.get("nextPageToken")
+        if token is None:
+            return None
+        request = FakeRequest(self.youtube.page)
+        request.page_token = token
+        return request
+
+
+class FakeChannels:
+    def list(self, **params):
+        uploads = {"items": [{"contentDetails": {"relatedPlaylists": {"uploads": "UU1"}}}]}
+        return FakeRequest(lambda token: uploads)
+
+
+class FakeYouTube:
+    """Uploads playlist, newest first, served 50 items per page."""
+
+    def __init__(self, video_ids):
+        self.video_ids = list(video_ids)
+        self.pages_read = 0
+
+    def page(self, token):
+        self.pages_read += 1
+        start = int(token or 0)
+        chunk = self.video_ids[start:start + 50]
+        response = {
+            "items": [
+                {
+                    "snippet": {
+                        "title": f"Day {video_id} of 1000",
+                        "resourceId": {"videoId": video_id},
+                        "publishedAt": "2025-03-01T10:00:00Z",
+                    },
+                    "contentDetails": {},
+                }
+                for video_id in chunk
+            ]
+        }
+        if start + 50 < len(self.video_ids):
+            response["nextPageToken"] = str(start + 50)
+        return response
+
+    def playlistItems(self):
+        return FakePlaylistItems(self)
+
+    def channels(self):
+        return FakeChannels()
+
+
+def test_sync_stops_at_first_page_with_known_video(tmp_path):
+    youtube = FakeYouTube(str(i) for i in range(200, 0, -1))
+    with UploadsIndex(tmp_path / "uploads.sqlite3") as index:
+        assert index.sync(youtube) == 200
+        assert youtube.pages_read == 4
+
+        # Три новых видео сверху: хватает одной страницы
+        youtube.video_ids[:0] = ["203", "202", "201"]
+        youtube.pages_read = 0
+        assert index.sync(youtube) == 3
+        assert youtube.pages_read == 1
+
+        ids = [upload.video_id for upload in index.items()]
+        assert ids[:4] == ["203", "202", "201", "200"]
+        assert len(ids) == 203
+
+
+def test_full_sync_drops_deleted_videos(tmp_path):
+    youtube = FakeYouTube(["3", "2", "1"])
+    with UploadsIndex(tmp_path / "uploads.sqlite3") as index:
+        index.sync(youtube)
+        youtube.video_ids.remove("2")
+        index.sync(youtube, full=True)
+        assert [upload.video_id for upload in index.items()] == ["3", "1"]
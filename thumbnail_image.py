@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Shared image helpers for thumbnails."""
+from __future__ import annotations
+
+import struct
+from io import BytesIO
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+# YouTube отклоняет обложки больше 2 МБ
+YOUTUBE_THUMBNAIL_MAX_BYTES = 2 * 1024 * 1024
+# Бюджет с запасом под multipart-обёртку загрузки
+DEFAULT_JPEG_BUDGET = int(YOUTUBE_THUMBNAIL_MAX_BYTES * 0.95)
+
+# Рекомендуемый YouTube размер обложки
+THUMBNAIL_SIZE = (1280, 720)
+
+MAX_QUALITY = 95
+MIN_QUALITY = 40
+
+TARGET_RATIO = 16 / 9
+RATIO_EPS = 0.0015
+
+# Поиск полей/плашек: ширина уменьшенной копии для анализа
+BOUNDS_ANALYSIS_WIDTH = 320
+# Строка/столбец — поле, если яркость почти однородна (std) и совпадает с краем
+BAR_MAX_STD = 6.0
+BAR_MAX_MEAN_DIFF = 12.0
+# Поле не может занимать больше этой доли стороны
+BAR_MAX_FRACTION = 0.25
+# Полем считается почти чёрная или почти белая полоса, либо полоса с
+# резким перепадом яркости на границе с содержимым — иначе это часть
+# кадра (ровное небо, стена) и её не трогаем
+BAR_DARK_MAX = 24.0
+BAR_LIGHT_MIN = 231.0
+BAR_MIN_STEP = 40.0
+
+Box = tuple[int, int, int, int]
+
+
+class EncodedJpeg(NamedTuple):
+    data: bytes
+    quality: int
+    size: tuple[int, int]
+    # Размер прежнего варианта (quality=95, без уменьшения); None — не считали
+    reference_bytes: Optional[int] = None
+
+    @property
+    def bytes_saved(self) -> Optional[int]:
+        if self.reference_bytes is None:
+            return None
+        return self.reference_bytes - len(self.data)
+
+
+def to_rgb(img: Image.Image) -> Image.Image:
+    """RGB-копия; прозрачность накладывается на чёрный фон."""
+    if img.mode in ("RGBA", "LA"):
+        background = Image.new("RGB", img.size, (0, 0, 0))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img.convert("RGB")
+
+
+def _bar_run(gray: np.ndarray, axis: int) -> tuple[int, int]:
+    """
+    Длина однородных полос с начала и с конца вдоль axis (0 — строки,
+    1 — столбцы) для 2D-массива яркости, вместе с первой строкой после
+    полосы: в уменьшенной копии она может смешивать поле и содержимое.
+    """
+    lines = gray if axis == 0 else gray.T
+    std = lines.std(axis=1)
+    mean = lines.mean(axis=1)
+    limit = int(len(lines) * BAR_MAX_FRACTION)
+
+    def run(std_part: np.ndarray, mean_part: np.ndarray) -> int:
+        edge_mean = mean_part[0]
+        is_bar = (std_part[:limit] <= BAR_MAX_STD) & (
+            np.abs(mean_part[:limit] - edge_mean) <= BAR_MAX_MEAN_DIFF
+        )
+        # Однотонно дальше предела — это фон (небо, стена), а не поле
+        if is_bar.all():
+            return 0
+        # Первая строка, которая не поле
+        bar = int(np.argmin(is_bar))
+        if bar == 0:
+            return 0
+        # Граница — по первой строке, целиком занятой содержимым
+        content = min(bar + 1, len(mean_part) - 1)
+        step = abs(float(mean_part[content]) - edge_mean)
+        if BAR_DARK_MAX < edge_mean < BAR_LIGHT_MIN and step < BAR_MIN_STEP:
+            return 0
+        return content
+
+    start = run(std, mean)
+    end = run(std[::-1], mean[::-1])
+    return start, end
+
+
+def content_bounds(img: Image.Image, full_size: Optional[tuple[int, int]] = None) -> Box:
+    """
+    (left, top, right, bottom) содержимого без однотонных полей по краям
+    (letterbox/pillarbox, рамки). Анализ идёт по уменьшенной копии: по
+    стандартному отклонению и средней яркости строк и столбцов.
+    full_size — размер оригинала, если img уже уменьшен (JPEG draft);
+    координаты возвращаются в его масштабе.
+    """
+    w, h = full_size or img.size
+    factor = max(1, img.width // BOUNDS_ANALYSIS_WIDTH)
+    gray = np.asarray(img.convert("L").reduce(factor), dtype=np.float32)
+    gh, gw = gray.shape
+
+    top, bottom = _bar_run(gray, 0)
+    left, right = _bar_run(gray, 1)
+
+    sx, sy = w / gw, h / gh
+    # Границы округляем внутрь, чтобы не оставить полоску поля
+    return (
+        min(w, int(np.ceil(left * sx))),
+        min(h, int(np.ceil(top * sy))),
+        max(0, int((gw - right) * sx)),
+        max(0, int((gh - bottom) * sy)),
+    )
+
+
+def is_close_to_16_9(w: int, h: int) -> bool:
+    return h > 0 and abs((w / h) - TARGET_RATIO) <= RATIO_EPS
+
+
+def crop_box_16x9(size: tuple[int, int], bounds: Optional[Box] = None) -> Optional[Box]:
+    """
+    Окно 16:9 максимального размера по центру содержимого bounds (по
+    умолчанию — вся картинка). None, если картинка уже 16:9 без полей.
+    """
+    w, h = size
+    left, top, right, bottom = bounds or (0, 0, w, h)
+    if (left, top, right, bottom) == (0, 0, w, h) and is_close_to_16_9(w, h):
+        return None
+
+    cw, ch = right - left, bottom - top
+    if cw / ch > TARGET_RATIO:
+        new_w = int(round(ch * TARGET_RATIO))
+        x0 = left + (cw - new_w) // 2
+        return (x0, top, x0 + new_w, bottom)
+
+    new_h = int(round(cw / TARGET_RATIO))
+    y0 = top + (ch - new_h) // 2
+    return (left, y0, right, y0 + new_h)
+
+
+def crop_to_16x9(img: Image.Image) -> Image.Image:
+    """
+    Обрезает до 16:9, сначала отбрасывая однотонные поля, которые иногда
+    добавляет модель: окно выбирается по центру содержимого, а не кадра.
+    """
+    box = crop_box_16x9(img.size, content_bounds(img))
+    return img if box is None else img.crop(box)
+
+
+# SOF-маркеры JPEG (кроме DHT 0xC4, JPG 0xC8, DAC 0xCC) — в них размеры кадра
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _jpeg_size(f) -> tuple[int, int]:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise ValueError("SOF не найден")
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # байты-заполнители
+            marker = f.read(1)
+        code = marker[0] if marker else 0
+        if code == 0x00 or 0xD0 <= code <= 0xD9 or code == 0x01:
+            continue  # маркеры без длины
+        length = struct.unpack(">H", f.read(2))[0]
+        if code in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def read_image_size(path: Union[str, Path]) -> tuple[int, int]:
+    """
+    (width, height) из заголовка JPEG/PNG без декодирования пикселей:
+    читаются только маркеры до SOF (JPEG) или IHDR (PNG). Для остальных
+    форматов — Image.open(), который тоже читает только заголовок.
+    """
+    with open(path, "rb") as f:
+        head = f.read(24)
+        if head[:2] == b"\xff\xd8":
+            try:
+                return _jpeg_size(f)
+            except (ValueError, struct.error):
+                pass
+        elif head[:8] == _PNG_SIGNATURE and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+
+    with Image.open(path) as img:
+        return img.size
+
+
+def _jpeg_bytes(img: Image.Image, quality: int, **options) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality, **options)
+    return buf.getvalue()
+
+
+def encode_jpeg_within_budget(
+    img: Image.Image,
+    max_bytes: int = DEFAULT_JPEG_BUDGET,
+    max_size: tuple[int, int] = THUMBNAIL_SIZE,
+    measure_savings: bool = False,
+) -> EncodedJpeg:
+    """
+    Кодирует JPEG не больше max_bytes: уменьшает до max_size (если больше),
+    пишет progressive + optimize и бинарным поиском подбирает наибольшее
+    quality в [MIN_QUALITY, MAX_QUALITY], которое влезает в бюджет.
+    Если не влезает даже MIN_QUALITY — картинка дополнительно уменьшается.
+    measure_savings — дополнительно закодировать оригинал с quality=95 для
+    reference_bytes (лишнее полноразмерное кодирование, только для отчётов).
+    """
+    rgb = to_rgb(img)
+    reference_bytes = len(_jpeg_bytes(rgb, MAX_QUALITY)) if measure_savings else None
+
+    if rgb.width > max_size[0] or rgb.height > max_size[1]:
+        rgb = rgb.copy()
+        rgb.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    options = {"progressive": True, "optimize": True}
+
+    while True:
+        data = _jpeg_bytes(rgb, MAX_QUALITY, **options)
+        if len(data) <= max_bytes:
+            return EncodedJpeg(data, MAX_QUALITY, rgb.size, reference_bytes)
+
+        best = None
+        lo, hi = MIN_QUALITY, MAX_QUALITY - 1
+        while lo <= hi:
+            quality = (lo + hi) // 2
+            candidate = _jpeg_bytes(rgb, quality, **options)
+            if len(candidate) <= max_bytes:
+                best = EncodedJpeg(candidate, quality, rgb.size, reference_bytes)
+                lo = quality + 1
+            else:
+                hi = quality - 1
+
+        if best is not None:
+            return best
+
+        rgb = rgb.resize(
+            (max(1, rgb.width * 3 // 4), max(1, rgb.height * 3 // 4)),
+            Image.Resampling.LANCZOS,
+        )
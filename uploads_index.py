@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Persistent local index of the channel uploads playlist.
+
+The uploads playlist is returned newest first, so after the first full scan
+only the head of the playlist has to be fetched: paging stops after the first
+page that contains an already indexed video.
+
+Lookups that only care about recent uploads (one target date) use
+iter_uploads_since: it streams rows newest first, page by page. The playlist
+is ordered by insertion, not strictly by publish time (scheduled streams and
+premieres are published after their neighbours), so rows older than the given
+moment are skipped and reading stops only after OLDER_RUN_LIMIT of them in a
+row.
+
+Readers get compact ``Upload`` records: video ID, title and the publish time
+parsed into a datetime once, when the row is read.
+"""
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from yt_read import read_request
+
+RUNTIME_DIR = Path(__file__).resolve().parent / "runtime"
+UPLOADS_INDEX_FILE = RUNTIME_DIR / "uploads_index.sqlite3"
+
+# Сколько видео старше since подряд означает, что дальше только старые
+# (одна страница playlistItems)
+OLDER_RUN_LIMIT = 50
+
+UploadRow = Tuple[str, str, Optional[str]]  # (video_id, title, published_at)
+
+
+class Upload(NamedTuple):
+    video_id: str
+    title: str
+    published_at: Optional[datetime]  # None, если API не вернул время
+
+    @classmethod
+    def from_row(cls, row: UploadRow) -> "Upload":
+        video_id, title, published = row
+        return cls(video_id, title, parse_published(published))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    video_id     TEXT PRIMARY KEY,
+    title        TEXT NOT NULL,
+    published_at TEXT,
+    seq          INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_seq ON uploads (seq);
+"""
+
+
+class UploadsIndex:
+    """SQLite-backed copy of the uploads playlist (``seq`` grows with recency)."""
+
+    def __init__(self, path: Path = UPLOADS_INDEX_FILE) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(str(path))
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "UploadsIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM uploads").fetchone()
+        return count
+
+    # ------------------------------------------------------------------
+    # meta
+    # ------------------------------------------------------------------
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def get_uploads_playlist_id(self, youtube) -> str:
+        """Return the uploads playlist ID, asking the API only the first time."""
+        cached = self._get_meta("uploads_playlist_id")
+        if cached:
+            return cached
+
+        resp = read_request(
+            youtube.channels(), "channels.uploads", part="contentDetails", mine=True
+        ).execute()
+        items = resp.get("items", [])
+        if not items:
+            raise RuntimeError("Не удалось получить канал (mine=True)")
+
+        uploads_id = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        with self._conn:
+            self._set_meta("uploads_playlist_id", uploads_id)
+        return uploads_id
+
+    # ------------------------------------------------------------------
+    # sync
+    # ------------------------------------------------------------------
+    def sync(self, youtube, full: bool = False, verbose: bool = False) -> int:
+        """Fetch new uploads into the index and return how many were added.
+
+        With ``full=True`` the index is rebuilt from scratch (use it after
+        deleting or renaming older videos outside of these scripts).
+        """
+        uploads_id = self.get_uploads_playlist_id(youtube)
+        known = set() if full else self._known_ids()
+
+        fetched: List[UploadRow] = []
+        for page in iter_playlist_pages(youtube, uploads_id):
+            fetched.extend(page)
+
+            if verbose:
+                print(f"Загружено {len(fetched)} элементов uploads playlist...")
+
+            if any(row[0] in known for row in page):
+                break
+
+        with self._conn:
+            if full:
+                self._conn.execute("DELETE FROM uploads")
+            added = self._store(fetched, known)
+
+        return added
+
+    def _known_ids(self) -> set[str]:
+        return {row[0] for row in self._conn.execute("SELECT video_id FROM uploads")}
+
+    def _store(self, fetched: List[UploadRow], known: set[str]) -> int:
+        """Upsert fetched rows (newest first); new ones get the highest ``seq``."""
+        new_rows = [row for row in fetched if row[0] not in known]
+        (max_seq,) = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM uploads"
+        ).fetchone()
+
+        top = max_seq + len(new_rows)
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO uploads (video_id, title, published_at, seq) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (video_id, title, published, top - i)
+                for i, (video_id, title, published) in enumerate(new_rows)
+            ],
+        )
+        self._conn.executemany(
+            "UPDATE uploads SET title = ?, published_at = ? WHERE video_id = ?",
+            [
+                (title, published, video_id)
+                for video_id, title, published in fetched
+                if video_id in known
+            ],
+        )
+        return len(new_rows)
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+    def iter_items(self, since: Optional[datetime] = None) -> Iterator[Upload]:
+        """Indexed uploads newest first, published at or after ``since`` (see take_since)."""
+        cursor = self._conn.execute(
+            "SELECT video_id, title, published_at FROM uploads ORDER BY seq DESC"
+        )
+        yield from take_since(map(Upload.from_row, cursor), since)
+
+    def items(self) -> List[Upload]:
+        """Return all indexed uploads, newest first."""
+        return list(self.iter_items())
+
+    def titles(self) -> List[str]:
+        return [
+            title
+            for (title,) in self._conn.execute("SELECT title FROM uploads ORDER BY seq DESC")
+        ]
+
+    def update_title(self, video_id: str, title: str) -> None:
+        """Reflect a title change made through the API without a resync."""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE uploads SET title = ? WHERE video_id = ?", (title, video_id)
+            )
+
+
+def parse_published(value: Optional[str]) -> Optional[datetime]:
+    """ISO-время из API (с "Z" на конце) или None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def published_before(upload: Upload, since: Optional[datetime]) -> bool:
+    """True, если видео опубликовано раньше since (без даты — не раньше)."""
+    if since is None or upload.published_at is None:
+        return False
+    return upload.published_at < since
+
+
+def take_since(
+    uploads: Iterable[Upload],
+    since: Optional[datetime],
+    older_run: int = OLDER_RUN_LIMIT,
+) -> Iterator[Upload]:
+    """
+    Uploads published at or after ``since``, in the given order. Older ones
+    are skipped; iteration stops after ``older_run`` older uploads in a row.
+    """
+    older = 0
+    for upload in uploads:
+        if published_before(upload, since):
+            older += 1
+            if older >= older_run:
+                return
+            continue
+        older = 0
+        yield upload
+
+
+def iter_playlist_pages(youtube, playlist_id: str) -> Iterator[List[UploadRow]]:
+    """Rows of a playlist page by page; the next page is requested only when needed."""
+    req = read_request(
+        youtube.playlistItems(),
+        "playlistItems.uploads",
+        part="snippet,contentDetails",
+        playlistId=playlist_id,
+        maxResults=50,
+    )
+    while req is not None:
+        resp = req.execute()
+        yield [
+            row for row in map(_row_from_item, resp.get("items", [])) if row is not None
+        ]
+        req = youtube.playlistItems().list_next(
+            previous_request=req, previous_response=resp
+        )
+
+
+def iter_uploads_since(
+    youtube,
+    since: datetime,
+    full_sync: bool = False,
+    verbose: bool = False,
+) -> Iterator[Upload]:
+    """
+    Uploads published at or after ``since``, newest first.
+
+    With an existing index it is synced (usually one page) and read until
+    ``since``. Without one, the playlist is streamed straight from the API and
+    paging stops after a run of OLDER_RUN_LIMIT videos older than ``since``
+    (see take_since), so a lookup for a recent date never walks the whole
+    channel; building the full index is left to a sync without a date limit
+    (or ``full_sync``).
+    """
+    with UploadsIndex() as index:
+        if full_sync or len(index):
+            added = index.sync(youtube, full=full_sync, verbose=verbose)
+            if verbose:
+                print(f"Uploads index: новых элементов {added}, всего {len(index)}.")
+            yield from index.iter_items(since)
+            return
+
+        uploads_id = index.get_uploads_playlist_id(youtube)
+
+    pages = 0
+
+    def streamed() -> Iterator[Upload]:
+        nonlocal pages
+        for page in iter_playlist_pages(youtube, uploads_id):
+            pages += 1
+            yield from map(Upload.from_row, page)
+
+    yield from take_since(streamed(), since)
+    if verbose:
+        print(f"Uploads playlist: прочитано страниц {pages}.")
+
+
+def _row_from_item(item: dict) -> Optional[UploadRow]:
+    snippet = item.get("snippet", {})
+    video_id = snippet.get("resourceId", {}).get("videoId")
+    title = snippet.get("title")
+    if not video_id or not title:
+        return None
+
+    published = (
+        item.get("contentDetails", {}).get("videoPublishedAt")
+        or snippet.get("publishedAt")
+    )
+    return video_id, title, published
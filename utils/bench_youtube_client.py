@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark: per-day YouTube client setup cost, before and after client caching.
+
+before — what schedule_stream used to do for every day: read the token file
+         and build a new service (discovery parse + new HTTP transport).
+after  — yt_auth.get_youtube_client: one service per process, reused.
+
+Without --online no network is touched: if there is no token file a dummy
+access token is used, so only token read + build() cost is measured. With
+--online every "day" also makes one cheap channels.list call, which adds the
+TCP/TLS handshake cost to "before" and keep-alive reuse to "after".
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from google.oauth2.credentials import Credentials
+
+import yt_auth
+from yt_auth import TOKEN_FILE, build_youtube_client, get_youtube_client
+from yt_stream import SCOPES as YT_SCOPES
+
+
+def load_creds() -> Credentials:
+    if os.path.exists(TOKEN_FILE):
+        return Credentials.from_authorized_user_file(TOKEN_FILE, YT_SCOPES)
+    return Credentials(token="offline-benchmark")
+
+
+def touch(youtube, online: bool) -> None:
+    if online:
+        youtube.channels().list(part="id", mine=True).execute()
+
+
+def bench_before(days: int, online: bool) -> float:
+    started = time.perf_counter()
+    for _ in range(days):
+        youtube = build_youtube_client(load_creds())
+        touch(youtube, online)
+    return time.perf_counter() - started
+
+
+def bench_after(days: int, online: bool) -> float:
+    # Креды подставляем заранее, чтобы не запускать OAuth-flow без токена
+    key = (str(Path(TOKEN_FILE).resolve()), frozenset(YT_SCOPES))
+    yt_auth._CREDENTIALS[key] = load_creds()
+
+    started = time.perf_counter()
+    for _ in range(days):
+        youtube = get_youtube_client(YT_SCOPES)
+        touch(youtube, online)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30, help="Number of simulated days")
+    parser.add_argument(
+        "--online",
+        action="store_true",
+        help="Make one real API call per day (needs a valid token)",
+    )
+    args = parser.parse_args()
+
+    before = bench_before(args.days, args.online)
+    after = bench_after(args.days, args.online)
+
+    print(f"Days: {args.days}  online: {args.online}")
+    print(f"before: {before:8.3f}s total  {before / args.days * 1000:8.1f} ms/day")
+    print(f"after:  {after:8.3f}s total  {after / args.days * 1000:8.1f} ms/day")
+    if after > 0:
+        print(f"speedup: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
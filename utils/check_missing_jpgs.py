@@ -1,59 +1,139 @@
+#!/usr/bin/env python3
+"""Create or refresh sequence/<N>.jpg from sequence/sources/<N>.png.
+
+A JPG is (re)built when it is missing, or older than its PNG and not
+already built from the PNG's current content. File stats, sizes and PNG
+hashes come from the shared asset manifest (asset_manifest.py), so an
+unchanged tree is checked with one scandir and no file reads. Conversions
+run in a process pool. --report-savings also measures the bytes saved
+against the old full-size quality=95 JPG (one extra encode per file).
+"""
+import argparse
 import os
-import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 from PIL import Image
 
-SRC_DIR = os.path.expanduser(
-    "~/projects/master_touch_meditation/sequence/sources"
-)
-JPG_DIR = os.path.expanduser(
-    "~/projects/master_touch_meditation/sequence"
-)
-
-pattern = re.compile(r"^(\d+)\.png$", re.IGNORECASE)
-
-print(f"Checking PNG files in: {SRC_DIR}")
-print(f"Against/into JPG files in:  {JPG_DIR}\n")
-
-missing = []
-
-for filename in os.listdir(SRC_DIR):
-    match = pattern.match(filename)
-    if not match:
-        continue  # пропускаем всё, что не <number>.png
-
-    number = match.group(1)
-    png_name = filename
-    png_path = os.path.join(SRC_DIR, png_name)
-    jpg_name = f"{number}.jpg"
-    jpg_path = os.path.join(JPG_DIR, jpg_name)
-
-    if not os.path.isfile(jpg_path):
-        print(f"MISSING JPG: {jpg_name}  -> creating from {png_name}")
-        missing.append(jpg_name)
-
-        # Открываем PNG и конвертируем в JPG того же размера
-        img = Image.open(png_path)
-
-        # Обрабатываем прозрачность, если есть
-        if img.mode in ("RGBA", "LA"):
-            # Композиция на чёрный фон (можно заменить на белый (255,255,255))
-            background = Image.new("RGB", img.size, (0, 0, 0))
-            background.paste(img, mask=img.split()[-1])
-            img = background
-        else:
-            img = img.convert("RGB")
-
-        # Сохраняем JPG
-        img.save(jpg_path, "JPEG", quality=95)
-        print(f"CREATED JPG: {jpg_path}")
+# Делаем импорт так, чтобы скрипт работал из папки utils/
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from asset_manifest import SOURCES_DIR, AssetManifest
+from mtm_content import SEQUENCE_DIR
+from thumbnail_image import encode_jpeg_within_budget
+
+SRC_DIR = str(SOURCES_DIR)
+JPG_DIR = str(SEQUENCE_DIR)
+
+
+def convert(png_path: str, jpg_path: str, report_savings: bool = False) -> tuple[int, str]:
+    """Runs in a worker process. Returns (bytes saved or 0, details for the log)."""
+    # Прозрачность накладывается на чёрный фон, размер — не больше
+    # 1280x720, quality подбирается под лимит YouTube в 2 МБ
+    with Image.open(png_path) as img:
+        encoded = encode_jpeg_within_budget(img, measure_savings=report_savings)
+    with open(jpg_path, "wb") as f:
+        f.write(encoded.data)
+    detail = f"{len(encoded.data) // 1024} KB, q={encoded.quality}"
+    if encoded.bytes_saved is None:
+        return 0, detail
+    return encoded.bytes_saved, f"{detail}, saved {encoded.bytes_saved // 1024} KB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Conversion processes (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--report-savings",
+        action="store_true",
+        help="Report bytes saved vs a full-size quality=95 JPG (extra encode per file)",
+    )
+    args = parser.parse_args()
+
+    print(f"Checking PNG files in: {SRC_DIR}")
+    print(f"Against/into JPG files in:  {JPG_DIR}\n")
+
+    started = time.perf_counter()
+    manifest = AssetManifest()
+    changed = manifest.refresh(hash_kinds=("png",))
+
+    todo = []
+    pngs = [key for key in manifest.records if key.startswith("sources/")]
+    for key in pngs:
+        png = manifest.records[key]
+        number = Path(key).stem
+        jpg_name = f"{number}.jpg"
+        jpg = manifest.records.get(jpg_name)
+
+        if jpg is None:
+            todo.append(("MISSING JPG", key, jpg_name, png.hash))
+        elif jpg.mtime_ns < png.mtime_ns and jpg.source_hash != png.hash:
+            # PNG новее JPG и JPG собран не из этого содержимого
+            todo.append(("STALE JPG  ", key, jpg_name, png.hash))
+
+    created = []
+    total_saved = 0
+    bytes_read = 0
+    if todo:
+        workers = max(1, min(args.workers, len(todo)))
+        print(f"{len(todo)} JPG files to build, using {workers} processes")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (label, key, jpg_name, png_hash, pool.submit(
+                    convert,
+                    str(manifest.file_path(key)),
+                    str(manifest.file_path(jpg_name)),
+                    args.report_savings,
+                ))
+                for label, key, jpg_name, png_hash in todo
+            ]
+            done = []
+            for label, key, jpg_name, png_hash, future in futures:
+                try:
+                    saved, detail = future.result()
+                except Exception as e:  # noqa: BLE001
+                    print(f"ERROR       {key}: {e}")
+                    continue
+                print(f"{label}: {jpg_name}  -> created from {Path(key).name} ({detail})")
+                created.append(jpg_name)
+                done.append((jpg_name, png_hash))
+                total_saved += saved
+                bytes_read += manifest.records[key].size
+
+        # Новые JPG попадают в манифест вместе с хэшем исходного PNG
+        manifest.refresh()
+        for jpg_name, png_hash in done:
+            manifest.set_source_hash(jpg_name, png_hash)
+
+    manifest.save()
+    elapsed = time.perf_counter() - started
+
+    if not created:
+        print("\nAll JPG files were already present and up to date.")
     else:
-        # Для контроля можно раскомментировать:
-        # print(f"OK: {jpg_name} exists")
-        pass
-
-if not missing:
-    print("\nAll JPG files were already present.")
-else:
-    print("\nNewly created JPG files:")
-    for f in missing:
-        print(" -", f)
+        print("\nNewly created JPG files:")
+        for f in sorted(created, key=lambda name: int(name.split(".")[0])):
+            print(" -", f)
+        if args.report_savings:
+            print(f"\nBytes saved vs quality=95 full size: {total_saved // 1024} KB")
+
+    elapsed = max(elapsed, 1e-9)
+    print(
+        f"\nChecked {len(pngs)} PNG ({len(changed)} manifest entries updated, "
+        f"{len(created)} converted) in {elapsed:.3f}s: {len(pngs) / elapsed:.0f} files/s "
+        f"scanned, {len(created) / elapsed:.1f} JPG/s, "
+        f"{bytes_read / 1024 ** 2 / elapsed:.1f} MB/s read"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Build one contact-sheet image with the thumbnails of a day range.
+
+Each sequence/<N>.jpg is decoded with JPEG draft mode (DCT scaling to 1/2,
+1/4 or 1/8 while decoding), so a full-size frame is never produced; tiles
+are loaded in a thread pool (Pillow releases the GIL while decoding). Every
+tile is labelled with the day number, weekday and date from day_index;
+Sundays are marked in red, missing days are shown as empty tiles.
+
+With the default 7 columns the sheet is aligned to weeks (Mon..Sun).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Делаем импорт так, чтобы скрипт работал из папки utils/
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from day_index import index_to_date
+from mtm_content import SEQUENCE_DIR
+from thumbnail_image import to_rgb
+
+RUNTIME_DIR = ROOT / "runtime"
+
+TILE_WIDTH = 256
+LABEL_HEIGHT = 22
+GAP = 4
+WEEK_COLUMNS = 7
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+BACKGROUND = (24, 24, 24)
+MISSING_FILL = (56, 56, 56)
+LABEL_COLOR = (235, 235, 235)
+SUNDAY_COLOR = (255, 90, 90)
+
+
+def parse_range(text: str) -> tuple[int, int]:
+    start, _, end = text.partition("-")
+    first, last = sorted((int(start), int(end or start)))
+    if first < 1:
+        raise ValueError("day numbers start at 1")
+    return first, last
+
+
+def load_tile(day: int, tile_size: tuple[int, int]) -> Optional[Image.Image]:
+    """Runs in a worker thread. The tile for day, or None if there is no JPG."""
+    path = SEQUENCE_DIR / f"{day}.jpg"
+    try:
+        with Image.open(path) as img:
+            # Декодер сразу уменьшает в 2/4/8 раз, не меньше tile_size
+            img.draft("RGB", tile_size)
+            tile = to_rgb(img)
+    except FileNotFoundError:
+        return None
+    tile.thumbnail(tile_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return tile
+
+
+def build_sheet(
+    first: int, last: int, columns: int, tile_width: int, workers: int
+) -> tuple[Image.Image, int]:
+    """(sheet, number of missing days)."""
+    tile_size = (tile_width, tile_width * 9 // 16)
+    days = list(range(first, last + 1))
+
+    # 7 колонок — неделя Пн..Вс: первый день встаёт под свой день недели
+    offset = index_to_date(first).weekday() if columns == WEEK_COLUMNS else 0
+    rows = (offset + len(days) + columns - 1) // columns
+    cell_w = tile_size[0] + GAP
+    cell_h = tile_size[1] + LABEL_HEIGHT + GAP
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        tiles = list(pool.map(lambda day: load_tile(day, tile_size), days))
+
+    sheet = Image.new("RGB", (columns * cell_w + GAP, rows * cell_h + GAP), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default(LABEL_HEIGHT - 8)
+
+    missing = 0
+    for i, (day, tile) in enumerate(zip(days, tiles)):
+        row, col = divmod(offset + i, columns)
+        x = GAP + col * cell_w
+        y = GAP + row * cell_h
+        if tile is None:
+            missing += 1
+            draw.rectangle((x, y, x + tile_size[0] - 1, y + tile_size[1] - 1), fill=MISSING_FILL)
+            draw.text(
+                (x + tile_size[0] // 2, y + tile_size[1] // 2),
+                "no JPG", font=font, fill=LABEL_COLOR, anchor="mm",
+            )
+        else:
+            sheet.paste(tile, (
+                x + (tile_size[0] - tile.width) // 2,
+                y + (tile_size[1] - tile.height) // 2,
+            ))
+
+        d = index_to_date(day)
+        weekday = d.weekday()
+        draw.text(
+            (x + 2, y + tile_size[1] + 3),
+            f"Day {day}  {WEEKDAYS[weekday]} {d:%d.%m.%Y}",
+            font=font,
+            fill=SUNDAY_COLOR if weekday == 6 else LABEL_COLOR,
+        )
+
+    return sheet, missing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("range", help="START-END (e.g. 300-330)")
+    parser.add_argument(
+        "--columns",
+        type=int,
+        default=WEEK_COLUMNS,
+        help=f"Tiles per row (default: {WEEK_COLUMNS}, aligned to weeks)",
+    )
+    parser.add_argument(
+        "--tile-width", type=int, default=TILE_WIDTH, help=f"Tile width in px (default: {TILE_WIDTH})"
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Output JPG (default: runtime/contact_sheet_<START>-<END>.jpg)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Decoding threads (default: number of CPU cores)",
+    )
+    args = parser.parse_args()
+
+    first, last = parse_range(args.range)
+    output = args.output or RUNTIME_DIR / f"contact_sheet_{first}-{last}.jpg"
+
+    started = time.perf_counter()
+    sheet, missing = build_sheet(first, last, max(1, args.columns), args.tile_width, max(1, args.workers))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    sheet.save(output, format="JPEG", quality=85, optimize=True)
+    elapsed = time.perf_counter() - started
+
+    total = last - first + 1
+    print(f"Contact sheet for days {first}-{last}: {output} ({sheet.width}x{sheet.height})")
+    if missing:
+        print(f"Days without JPG: {missing} of {total}")
+    print(f"Built in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} days/s)")
+
+
+if __name__ == "__main__":
+    main()
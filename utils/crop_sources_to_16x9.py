@@ -1,75 +1,103 @@
 #!/usr/bin/env python3
 from pathlib import Path
-from PIL import Image
+from PIL import Image, JpegImagePlugin
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import os
 import sys
-from datetime import datetime
 
-SOURCES_DIR = Path.home() / "projects" / "master_touch_meditation" / "sequence"
-TARGET_RATIO = 16 / 9
-RATIO_EPS = 0.0015
-
-DEFAULT_SINCE = "2025-11-01"
-
-
-def parse_date(date_str: str) -> datetime:
-    return datetime.strptime(date_str, "%Y-%m-%d")
-
-
-def is_close_to_16_9(w: int, h: int) -> bool:
-    return abs((w / h) - TARGET_RATIO) <= RATIO_EPS
-
-
-def crop_vertical_to_ratio(img: Image.Image):
-    w, h = img.size
-
-    if is_close_to_16_9(w, h):
+# Делаем импорт так, чтобы скрипт работал из папки utils/
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from asset_manifest import AssetManifest
+from mtm_content import SEQUENCE_DIR
+from thumbnail_image import (
+    BOUNDS_ANALYSIS_WIDTH,
+    TARGET_RATIO,
+    content_bounds,
+    crop_box_16x9,
+    is_close_to_16_9,
+)
+
+SOURCES_DIR = SEQUENCE_DIR
+
+
+def content_crop_box(size, bounds):
+    """
+    Окно 16:9 по содержимому bounds или None. Картинки шире 16:9 без полей
+    не трогаем: резать им бока нельзя.
+    """
+    w, h = size
+    if bounds == (0, 0, w, h) and w / h > TARGET_RATIO:
         return None
+    return crop_box_16x9(size, bounds)
 
-    target_h = int(round(w * 9 / 16))
 
-    if target_h >= h:
+def find_crop_box(path: str):
+    """
+    content_crop_box для файла. Поля ищутся по уменьшенной при
+    декодировании (JPEG draft) копии в оттенках серого.
+    """
+    with Image.open(path) as img:
+        size = img.size
+        img.draft("L", (BOUNDS_ANALYSIS_WIDTH, BOUNDS_ANALYSIS_WIDTH * size[1] // size[0]))
+        bounds = content_bounds(img, full_size=size)
+    return content_crop_box(size, bounds)
+
+
+def jpeg_save_options(img: Image.Image) -> dict:
+    """
+    Параметры, с которыми JPEG был закодирован: те же таблицы квантования
+    и субдискретизация вместо quality=75 по умолчанию, плюс ICC/EXIF.
+    """
+    options = {}
+    if isinstance(img, JpegImagePlugin.JpegImageFile):
+        options["qtables"] = img.quantization
+        sampling = JpegImagePlugin.get_sampling(img)
+        if sampling != -1:
+            options["subsampling"] = sampling
+        options["progressive"] = bool(img.info.get("progressive"))
+    for key in ("icc_profile", "exif"):
+        if img.info.get(key):
+            options[key] = img.info[key]
+    return options
+
+
+def crop_file(path: str, dry_run: bool):
+    """Выполняется в дочернем процессе. Возвращает (размер, окно) или None."""
+    box = find_crop_box(path)
+    if box is None:
         return None
-
-    total_crop = h - target_h
-    top_crop = total_crop // 2
-    bottom_crop = total_crop - top_crop
-
-    return img.crop((0, top_crop, w, h - bottom_crop))
-
-
-def process_file(path: Path, dry_run: bool):
     with Image.open(path) as img:
-        w, h = img.size
-
-        cropped = crop_vertical_to_ratio(img)
-
-        if cropped is None:
-            if is_close_to_16_9(w, h):
-                print(f"OK    {path.name}: {w}x{h}")
-            else:
-                target_h = int(round(w * 9 / 16))
-                if target_h > h:
-                    print(f"SKIP  {path.name}: {w}x{h} (cannot reach 16:9 by vertical crop)")
-                else:
-                    print(f"SKIP  {path.name}: {w}x{h}")
-            return
-
-        cw, ch = cropped.size
-        total_crop = h - ch
-        top_crop = total_crop // 2
-        bottom_crop = total_crop - top_crop
-
+        size = img.size
         if dry_run:
-            print(f"DRY   {path.name}: {w}x{h} -> {cw}x{ch} (cut {top_crop}px top, {bottom_crop}px bottom)")
-        else:
-            cropped.save(path)
-            print(f"DONE  {path.name}: {w}x{h} -> {cw}x{ch} (cut {top_crop}px top, {bottom_crop}px bottom)")
+            return size, box
+        options = jpeg_save_options(img)
+        cropped = img.crop(box)
+        tmp_path = f"{path}.tmp"
+        cropped.save(tmp_path, format="JPEG", **options)
+    os.replace(tmp_path, path)
+    return size, box
+
+
+def describe_crop(size, box) -> str:
+    w, h = size
+    left, top, right, bottom = box
+    return (
+        f"{w}x{h} -> {right - left}x{bottom - top} "
+        f"(cut {top}px top, {h - bottom}px bottom, {left}px left, {w - right}px right)"
+    )
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Crop JPGs in sources to 16:9 by trimming top/bottom only."
+        description=(
+            "Crop JPGs in sources to 16:9, dropping uniform borders (letterbox,"
+            " pillarbox, frames) first. Sizes come from the asset manifest"
+            " (asset_manifest.py): headers are read only for new or changed files."
+        )
     )
     parser.add_argument(
         "--dry-run",
@@ -77,29 +105,71 @@ def main():
         help="Only print actions, do not modify files.",
     )
     parser.add_argument(
-        "--since",
-        default=DEFAULT_SINCE,
-        help=f"Process files modified after this date (YYYY-MM-DD). Default: {DEFAULT_SINCE}",
+        "--detect-bars",
+        action="store_true",
+        help="Also look for borders in files that are already 16:9.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes used for cropping (default: number of CPU cores).",
     )
     args = parser.parse_args()
 
-    since_dt = parse_date(args.since)
-
     if not SOURCES_DIR.is_dir():
         print(f"Directory not found: {SOURCES_DIR}")
         sys.exit(1)
 
-    files = sorted(SOURCES_DIR.glob("*.jpg"))
-    if not files:
+    manifest = AssetManifest()
+    manifest.refresh()
+    jpgs = sorted(key for key in manifest.records if "/" not in key)
+
+    if not jpgs:
         print(f"No .jpg files found in {SOURCES_DIR}")
         return
 
-    for f in files:
-        mtime = datetime.fromtimestamp(f.stat().st_mtime)
-        if mtime <= since_dt:
-            continue
-
-        process_file(f, dry_run=args.dry_run)
+    ok = 0
+    to_check = []
+    for name in jpgs:
+        record = manifest.records[name]
+        if not record.height:
+            print(f"SKIP  {name}: unreadable header")
+        elif is_close_to_16_9(record.width, record.height) and not args.detect_bars:
+            ok += 1
+        else:
+            to_check.append(name)
+
+    if to_check:
+        workers = max(1, min(args.workers, len(to_check)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (name, pool.submit(crop_file, str(manifest.file_path(name)), args.dry_run))
+                for name in to_check
+            ]
+            for name, future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:  # noqa: BLE001
+                    print(f"ERROR {name}: {e}")
+                    continue
+                record = manifest.records[name]
+                if result is None:
+                    if is_close_to_16_9(record.width, record.height):
+                        ok += 1
+                    else:
+                        print(
+                            f"SKIP  {name}: {record.width}x{record.height} "
+                            "(wider than 16:9, no borders to drop)"
+                        )
+                    continue
+                label = "DRY  " if args.dry_run else "DONE "
+                print(f"{label} {name}: {describe_crop(*result)}")
+        if not args.dry_run:
+            manifest.refresh()
+
+    manifest.save()
+    print(f"OK    {ok} files already 16:9")
 
 
 if __name__ == "__main__":
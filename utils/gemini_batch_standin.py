@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Gemini batch API, for testing gemini_batch.py.
+
+Implements just what the google-genai client uses in Gemini Developer API mode:
+
+  POST /v1beta/models/<model>:batchGenerateContent  -> new job (PENDING)
+  GET  /v1beta/batches/<id>                         -> job state / results
+
+A job is RUNNING after the first poll and SUCCEEDED once --delay seconds have
+passed since it was created. Each inline request is answered with a plain
+16:9 PNG whose colour depends on the request index; a prompt containing
+--fail-marker gets a per-request error instead.
+
+Usage:
+  python utils/gemini_batch_standin.py --port 8765 --delay 5
+  GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=test \\
+      python gemini_batch.py 300-330 --force
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+CREATE_PATH = re.compile(r"^/v1beta/models/([^/:]+):batchGenerateContent$")
+GET_PATH = re.compile(r"^/v1beta/batches/([^/?]+)")
+
+
+class StandinState:
+    def __init__(self, delay: float, size: tuple[int, int], fail_marker: str) -> None:
+        self.delay = delay
+        self.size = size
+        self.fail_marker = fail_marker
+        self.jobs: dict[str, dict] = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def create(self, model: str, body: dict) -> dict:
+        batch = body.get("batch", {})
+        requests = batch.get("inputConfig", {}).get("requests", {}).get("requests", [])
+        with self.lock:
+            job_id = f"standin-{next(self.ids)}"
+            self.jobs[job_id] = {
+                "model": model,
+                "display_name": batch.get("displayName", ""),
+                "requests": requests,
+                "created": time.monotonic(),
+                "polled": False,
+            }
+        print(f"created batches/{job_id}: {len(requests)} requests")
+        return self.describe(job_id)
+
+    def describe(self, job_id: str) -> dict:
+        job = self.jobs[job_id]
+        done = time.monotonic() - job["created"] >= self.delay
+        if done:
+            state = "BATCH_STATE_SUCCEEDED"
+        elif job["polled"]:
+            state = "BATCH_STATE_RUNNING"
+        else:
+            state = "BATCH_STATE_PENDING"
+        job["polled"] = True
+
+        metadata = {
+            "displayName": job["display_name"],
+            "model": f"models/{job['model']}",
+            "state": state,
+        }
+        if done:
+            metadata["output"] = {
+                "inlinedResponses": {
+                    "inlinedResponses": [
+                        self.respond(i, request)
+                        for i, request in enumerate(job["requests"])
+                    ]
+                }
+            }
+        return {"name": f"batches/{job_id}", "metadata": metadata}
+
+    def respond(self, i: int, request: dict) -> dict:
+        reply: dict = {"metadata": request.get("metadata", {})}
+        contents = request.get("request", {}).get("contents", [])
+        texts = [
+            part.get("text", "")
+            for content in contents
+            for part in content.get("parts", [])
+        ]
+        if self.fail_marker and any(self.fail_marker in text for text in texts):
+            reply["error"] = {"code": 400, "message": "stand-in: rejected prompt"}
+            return reply
+
+        buf = BytesIO()
+        color = ((40 * i) % 256, (90 + 17 * i) % 256, (160 + 29 * i) % 256)
+        Image.new("RGB", self.size, color).save(buf, format="PNG")
+        image = {"mimeType": "image/png", "data": base64.b64encode(buf.getvalue()).decode()}
+        reply["response"] = {
+            "candidates": [{"content": {"role": "model", "parts": [{"inlineData": image}]}}]
+        }
+        return reply
+
+
+def make_handler(state: StandinState):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:  # noqa: N802
+            match = CREATE_PATH.match(self.path.split("?")[0])
+            if not match:
+                self._send(404, {"error": {"code": 404, "message": self.path}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            self._send(200, state.create(match.group(1), body))
+
+        def do_GET(self) -> None:  # noqa: N802
+            match = GET_PATH.match(self.path)
+            if not match or match.group(1) not in state.jobs:
+                self._send(404, {"error": {"code": 404, "message": self.path}})
+                return
+            self._send(200, state.describe(match.group(1)))
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002
+            print(f"{self.command} {self.path.split('?')[0]}")
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=5.0, help="Seconds until a job succeeds")
+    parser.add_argument("--width", type=int, default=1344)
+    parser.add_argument("--height", type=int, default=768)
+    parser.add_argument(
+        "--fail-marker",
+        default="",
+        help="Requests whose prompt contains this text get an error response",
+    )
+    args = parser.parse_args()
+
+    state = StandinState(args.delay, (args.width, args.height), args.fail_marker)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"Gemini batch stand-in on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,30 @@
+import hashlib
 import os
+import threading
 from pathlib import Path
-from typing import Sequence
+from typing import Dict, FrozenSet, Optional, Sequence, Tuple
 
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.http import build_http
 from google.auth.transport.requests import Request
 from google.auth.exceptions import RefreshError
 
+from http_cache import CachingHttp, cache_from_env
+
 # Имена файлов по умолчанию
 CLIENT_SECRET_FILE = "config/client_secret_youtube.json"
 TOKEN_FILE = "config/token_youtube.json"
 TOKEN_REVOKED_FLAG = Path("automation/config/.youtube_token_revoked")
 
+# Креды общие на процесс: (token_file, scopes) -> Credentials.
+# Клиенты — свои в каждом потоке: httplib2.Http не потокобезопасен.
+_CREDENTIALS: Dict[Tuple[str, FrozenSet[str]], Credentials] = {}
+_CREDENTIALS_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
 
 def _flag_is_active(flag_path: Path, token_path: Path) -> bool:
     if not flag_path.exists():
@@ -38,14 +50,14 @@ def _clear_revoked_flag(flag_path: Path) -> None:
         flag_path.unlink()
 
 
-def get_youtube_service(
+def _load_credentials(
     scopes: Sequence[str],
-    client_secret_file: str = CLIENT_SECRET_FILE,
-    token_file: str = TOKEN_FILE,
-):
+    client_secret_file: str,
+    token_file: str,
+) -> Optional[Credentials]:
     """
-    Возвращает объект youtube-service с заданными scopes.
-    Использует token_file, при необходимости обновляет или переавторизуется.
+    Загружает OAuth-креды из token_file, при необходимости обновляет
+    или переавторизуется. Возвращает None, если refresh token отозван.
     """
     token_path = Path(token_file)
     flag_path = TOKEN_REVOKED_FLAG
@@ -82,6 +94,71 @@ def get_youtube_service(
         with open(token_file, "w", encoding="utf-8") as token:
             token.write(creds.to_json())
 
+    return creds
+
+
+def build_youtube_client(creds):
+    """
+    Создаёт клиент YouTube Data API поверх собственного AuthorizedHttp.
+    httplib2.Http держит keep-alive соединения, пока клиент жив, а
+    AuthorizedHttp сам обновляет access token при истечении.
+    GET-запросы идут через условный кэш на диске (http_cache.py), если он
+    не выключен через YT_HTTP_CACHE=0.
+    """
+    http = build_http()
+    # Кэш раздельный для каждого аккаунта; в ключе только хэш, не сам токен
+    account = f"{creds.client_id}\0{creds.refresh_token or ''}"
+    cache = cache_from_env(namespace=hashlib.sha256(account.encode("utf-8")).hexdigest()[:16])
+    if cache is not None:
+        http = CachingHttp(http, cache)
+    http = AuthorizedHttp(creds, http=http)
+    return build("youtube", "v3", http=http, cache_discovery=False)
+
+
+def get_youtube_service(
+    scopes: Sequence[str],
+    client_secret_file: str = CLIENT_SECRET_FILE,
+    token_file: str = TOKEN_FILE,
+):
+    """
+    Возвращает объект youtube-service с заданными scopes.
+    Использует token_file, при необходимости обновляет или переавторизуется.
+    """
+    creds = _load_credentials(scopes, client_secret_file, token_file)
+    if creds is None:
+        return None
+
     # Создаём клиент YouTube Data API
-    youtube = build("youtube", "v3", credentials=creds)
+    return build_youtube_client(creds)
+
+
+def get_youtube_client(
+    scopes: Sequence[str],
+    client_secret_file: str = CLIENT_SECRET_FILE,
+    token_file: str = TOKEN_FILE,
+):
+    """
+    Как get_youtube_service, но клиент создаётся один раз для каждой пары
+    (token_file, scopes) и дальше переиспользуется вместе с HTTP-соединением.
+    Креды загружаются один раз на процесс, клиент — один раз на поток.
+    Используйте в циклах по дням вместо get_youtube_service.
+    """
+    key = (str(Path(token_file).resolve()), frozenset(scopes))
+    clients = getattr(_LOCAL, "clients", None)
+    if clients is None:
+        clients = _LOCAL.clients = {}
+
+    youtube = clients.get(key)
+    if youtube is not None:
+        return youtube
+
+    with _CREDENTIALS_LOCK:
+        creds = _CREDENTIALS.get(key)
+        if creds is None:
+            creds = _load_credentials(scopes, client_secret_file, token_file)
+            if creds is None:
+                return None
+            _CREDENTIALS[key] = creds
+
+    youtube = clients[key] = build_youtube_client(creds)
     return youtube
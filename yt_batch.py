@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Batched YouTube API requests on top of googleapiclient BatchHttpRequest.
+
+Independent calls (playlist inserts for many days, list lookups) are queued
+with a caller-chosen key and sent as multipart batch requests. Each result is
+routed back to its key, so one failed item does not hide the others.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Hashable, List, Optional, Tuple
+
+# Лимит YouTube Data API на количество вызовов в одном batch-запросе
+BATCH_LIMIT = 50
+
+BatchResult = Tuple[Hashable, Optional[dict], Optional[Exception]]  # (key, response, error)
+
+
+class YouTubeBatch:
+    """Queue of API requests executed in chunks of ``limit`` per HTTP round trip."""
+
+    def __init__(self, youtube, limit: int = BATCH_LIMIT) -> None:
+        self.youtube = youtube
+        self.limit = limit
+        self._pending: List[Tuple[Hashable, Any]] = []
+        # add() может вызываться из рабочих потоков schedule_range --workers
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, key: Hashable, request) -> None:
+        """Queue an unexecuted request (e.g. ``youtube.playlistItems().insert(...)``)."""
+        with self._lock:
+            self._pending.append((key, request))
+
+    def execute(self) -> List[BatchResult]:
+        """Send all queued requests; return results in the order they were added."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        results: List[BatchResult] = []
+
+        for start in range(0, len(pending), self.limit):
+            chunk = pending[start:start + self.limit]
+            replies: dict[str, Tuple[Optional[dict], Optional[Exception]]] = {}
+
+            def callback(request_id, response, exception):
+                replies[request_id] = (response, exception)
+
+            batch = self.youtube.new_batch_http_request(callback=callback)
+            for i, (_, request) in enumerate(chunk):
+                batch.add(request, request_id=str(i))
+
+            try:
+                batch.execute()
+            except Exception as e:  # noqa: BLE001
+                # Весь multipart-запрос не прошёл — ошибка у каждого элемента
+                for key, _ in chunk:
+                    results.append((key, None, e))
+                continue
+
+            for i, (key, _) in enumerate(chunk):
+                response, exception = replies.get(
+                    str(i), (None, RuntimeError("Нет ответа в batch-запросе"))
+                )
+                results.append((key, response, exception))
+
+        return results
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Read-only YouTube API calls with partial responses and byte accounting.
+
+Every ``list`` call in the scripts goes through ``read_request``: it adds the
+``fields=`` mask registered for the call (only what the code reads, plus
+``nextPageToken`` for paged calls), makes sure the response is requested
+gzip-compressed, and counts the response bytes per call label (responses
+served by the HTTP cache, see http_cache.py, are counted separately). Pages
+fetched with ``list_next`` inherit the mask and the counting.
+``print_read_summary()`` prints the totals at the end of a run.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Tuple
+
+from http_cache import HTTP_CACHE_STATS
+
+FIELD_MASKS: Dict[str, str] = {
+    # uploads_index.get_uploads_playlist_id
+    "channels.uploads": "items/contentDetails/relatedPlaylists/uploads",
+    # uploads_index.iter_playlist_pages
+    "playlistItems.uploads": (
+        "nextPageToken,"
+        "items(snippet(title,publishedAt,resourceId/videoId),contentDetails/videoPublishedAt)"
+    ),
+    # process_backup_video.add_video_to_playlist: только ID видео
+    "playlistItems.videoIds": "nextPageToken,items/snippet/resourceId/videoId",
+    # broadcast_cache.BroadcastCache.refresh / _recheck
+    "liveBroadcasts.list": (
+        "nextPageToken,items(id,snippet(title,scheduledStartTime),status/lifeCycleStatus)"
+    ),
+    # yt_stream.get_stream_ingestion
+    "liveStreams.ingestion": "items/cdn/ingestionInfo(ingestionAddress,streamName)",
+    # list_stream_keys.py
+    "liveStreams.keys": (
+        "nextPageToken,items(id,snippet/title,cdn/ingestionInfo(ingestionAddress,streamName))"
+    ),
+    # process_backup_video.update_video_metadata: snippet целиком, он уходит
+    # обратно в videos().update и не должен терять поля
+    "videos.snippet": "items/snippet",
+}
+
+
+class ReadStats:
+    """Thread-safe per-label counters: calls, network bytes, gzip responses, cached responses."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+
+    def record(self, label: str, size: int, gzipped: bool, cached: bool = False) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(label, [0, 0, 0, 0])
+            counts[0] += 1
+            if cached:
+                counts[3] += 1
+                return
+            counts[1] += size
+            counts[2] += int(gzipped)
+
+    def snapshot(self) -> Dict[str, Tuple[int, int, int, int]]:
+        with self._lock:
+            return {label: tuple(counts) for label, counts in self._counts.items()}
+
+
+READ_STATS = ReadStats()
+
+
+def read_request(resource, label: str, **params):
+    """
+    ``resource.list(**params)`` with the field mask of ``label`` and gzip.
+    Returns the unexecuted request; ``list_next`` on it keeps both.
+    """
+    if label not in FIELD_MASKS:
+        raise RuntimeError(f"Нет маски полей для вызова {label!r} (см. yt_read.FIELD_MASKS)")
+
+    request = resource.list(fields=FIELD_MASKS[label], **params)
+
+    # googleapiclient уже просит gzip, но сервер сжимает ответ, только если
+    # в User-Agent есть "gzip" — не полагаемся на это молча
+    headers = request.headers
+    headers["accept-encoding"] = "gzip, deflate"
+    if "gzip" not in headers.get("user-agent", ""):
+        headers["user-agent"] = (headers.get("user-agent", "") + " (gzip)").strip()
+
+    postproc = request.postproc
+
+    def counted(resp, content):
+        # httplib2 уже распаковал тело и пометил это заголовком "-content-encoding";
+        # "-cache" ставит http_cache, тело тогда не приходило по сети целиком
+        READ_STATS.record(
+            label,
+            len(content),
+            resp.get("-content-encoding") == "gzip",
+            cached="-cache" in resp,
+        )
+        return postproc(resp, content)
+
+    request.postproc = counted
+    return request
+
+
+def read_summary() -> str:
+    """One line per call label, heaviest first; empty if nothing was read."""
+    stats = READ_STATS.snapshot()
+    if not stats:
+        return ""
+
+    lines = ["YouTube reads (JSON bytes after gzip decoding):"]
+    for label, (calls, total, gzipped, cached) in sorted(stats.items(), key=lambda kv: -kv[1][1]):
+        lines.append(
+            f"  {label:<24} {calls:>4} calls  {total / 1024:>9.1f} KB  "
+            f"gzip {gzipped}/{calls - cached}  cached {cached}"
+        )
+    total_calls = sum(counts[0] for counts in stats.values())
+    total_bytes = sum(counts[1] for counts in stats.values())
+    lines.append(f"  {'total':<24} {total_calls:>4} calls  {total_bytes / 1024:>9.1f} KB")
+    cache_summary = HTTP_CACHE_STATS.summary()
+    if cache_summary:
+        lines.append(cache_summary)
+    return "\n".join(lines)
+
+
+def print_read_summary() -> None:
+    summary = read_summary()
+    if summary:
+        print(summary)
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-from typing import List, Optional, Tuple
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple, Union
 
 from dotenv import dotenv_values
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 
-from yt_auth import get_youtube_service
+from broadcast_cache import Broadcast, BroadcastCache, latest_scheduled, load_broadcast_cache
+from mtm_content import group_by_day
+from yt_auth import get_youtube_client
+from yt_batch import YouTubeBatch
+from yt_read import read_request
 
 
 # --------------------------------------------------------------------
@@ -24,11 +29,8 @@ SCOPES: List[str] = [
 
 PlaylistSpec = Tuple[str, str]  # (playlist_id, alias)
 
-
-def day_title_key(index: int) -> str:
-    """Return the title fragment used to identify a day's stream."""
-
-    return f"Day {index} of 1000"
+# stream_id -> (rtmp_url, stream_key)
+_INGESTION_CACHE: Dict[str, Tuple[str, str]] = {}
 
 
 # --------------------------------------------------------------------
@@ -110,21 +112,28 @@ def set_thumbnail(
     youtube,
     broadcast_id: str,
     thumbnail_path: str,
+    thumbnail_bytes: Optional[bytes] = None,
 ):
-    """Загружает thumbnail для видео/стрима."""
-    media = MediaFileUpload(thumbnail_path, mimetype="image/jpeg")
+    """
+    Загружает thumbnail для видео/стрима. Если переданы thumbnail_bytes
+    (JPEG в памяти), файл thumbnail_path не читается.
+    """
+    if thumbnail_bytes is not None:
+        media = MediaIoBaseUpload(BytesIO(thumbnail_bytes), mimetype="image/jpeg")
+    else:
+        media = MediaFileUpload(thumbnail_path, mimetype="image/jpeg")
     youtube.thumbnails().set(
         videoId=broadcast_id,
         media_body=media,
     ).execute()
 
 
-def add_video_to_playlist(
+def build_playlist_insert(
     youtube,
     playlist_id: str,
     video_id: str,
 ):
-    """Добавляет видео/стрим в плейлист."""
+    """Возвращает (не выполненный) запрос добавления видео в плейлист."""
     body = {
         "snippet": {
             "playlistId": playlist_id,
@@ -135,64 +144,88 @@ def add_video_to_playlist(
         }
     }
 
-    youtube.playlistItems().insert(
+    return youtube.playlistItems().insert(
         part="snippet",
         body=body,
-    ).execute()
+    )
 
 
-def load_live_broadcasts(youtube, broadcast_status: str = "all") -> List[dict]:
-    """Return live broadcasts for the channel.
+def add_video_to_playlist(
+    youtube,
+    playlist_id: str,
+    video_id: str,
+):
+    """Добавляет видео/стрим в плейлист."""
+    build_playlist_insert(youtube, playlist_id, video_id).execute()
 
-    The YouTube API no longer allows combining ``mine`` with
-    ``broadcastStatus``. To keep the same behaviour we fetch everything and
-    filter locally by ``lifeCycleStatus`` when a filter is requested.
+
+def get_stream_ingestion(youtube, stream_id: str) -> Tuple[str, str]:
+    """
+    Возвращает (rtmp_url, stream_key) для liveStream.
+    Ответ кэшируется на процесс: постоянный поток одинаков для всех дней.
     """
+    cached = _INGESTION_CACHE.get(stream_id)
+    if cached:
+        return cached
 
-    broadcasts: List[dict] = []
-    request = youtube.liveBroadcasts().list(
-        part="id,snippet,status",
-        maxResults=50,
-        broadcastType="all",
-        mine=True,
-    )
+    stream_resp = read_request(
+        youtube.liveStreams(),
+        "liveStreams.ingestion",
+        part="cdn",
+        id=stream_id,
+    ).execute()
+
+    items = stream_resp.get("items", [])
+    if not items:
+        raise RuntimeError(
+            f"Не найден liveStream с id={stream_id}. "
+            "Проверь, что ты указал корректный stream id."
+        )
 
-    while request is not None:
-        response = request.execute()
-        broadcasts.extend(response.get("items", []))
-        request = youtube.liveBroadcasts().list_next(request, response)
+    ingestion = items[0]["cdn"]["ingestionInfo"]
+    result = (ingestion["ingestionAddress"], ingestion["streamName"])
+    _INGESTION_CACHE[stream_id] = result
+    return result
 
-    if broadcast_status == "all":
-        return broadcasts
 
-    def matches_status(item: dict) -> bool:
-        status = item.get("status", {}).get("lifeCycleStatus")
+def load_live_broadcasts(
+    youtube,
+    broadcast_status: str = "all",
+    full_refresh: bool = False,
+) -> List[Broadcast]:
+    """Return live broadcasts for the channel.
 
-        if broadcast_status == "completed":
-            return status == "complete"
+    The YouTube API no longer allows combining ``mine`` with
+    ``broadcastStatus``, so the listing always covers the whole channel.
+    It is kept in the persistent broadcast cache (broadcast_cache.py): only
+    recent pages and unfinished broadcasts are re-read, and the status filter
+    ("upcoming", "active", "completed") is an index lookup.
+    """
 
-        if broadcast_status == "active":
-            return status in {"live", "liveStarting", "testing", "testStarting"}
+    cache = load_broadcast_cache(youtube, full=full_refresh)
+    return cache.with_status(broadcast_status)
 
-        if broadcast_status == "upcoming":
-            return status in {"upcoming", "created", "ready"}
 
-        return True
+def group_broadcasts_by_day(broadcasts: List[Broadcast]) -> Dict[int, List[Broadcast]]:
+    """Index broadcasts by the day number parsed from their titles."""
 
-    return [item for item in broadcasts if matches_status(item)]
+    return group_by_day(broadcasts, lambda item: item.title)
 
 
-def find_broadcast_by_day(index: int, broadcasts: List[dict]) -> Optional[dict]:
-    """Find the first broadcast whose title contains the day key."""
+def find_broadcast_by_day(
+    index: int,
+    broadcasts_by_day: Union[Dict[int, List[Broadcast]], BroadcastCache],
+) -> Optional[Broadcast]:
+    """Return the broadcast for the day (see ``group_broadcasts_by_day``).
 
-    key = day_title_key(index)
+    With several broadcasts for one day the latest scheduled one wins.
+    A ``BroadcastCache`` answers from its day index without grouping first.
+    """
 
-    for item in broadcasts:
-        title = item.get("snippet", {}).get("title", "")
-        if key in title:
-            return item
+    if isinstance(broadcasts_by_day, BroadcastCache):
+        return broadcasts_by_day.find_by_day(index)
 
-    return None
+    return latest_scheduled(broadcasts_by_day.get(index, ()))
 
 
 # --------------------------------------------------------------------
@@ -207,6 +240,9 @@ def schedule_stream(
     use_persistent_stream: bool = True,
     enable_auto_start: bool = False,
     enable_auto_stop: bool = False,
+    youtube=None,
+    batch: Optional[YouTubeBatch] = None,
+    thumbnail_bytes: Optional[bytes] = None,
 ) -> dict:
     """
     Создаёт запланированный стрим, привязывает к ПЕРМАНЕНТНОМУ потоку
@@ -222,6 +258,13 @@ def schedule_stream(
       - use_persistent_stream: True — привязывать к постоянному потоку,
         False — создавать отдельный liveStream для эфира
       - enable_auto_start / enable_auto_stop: прокидываются в broadcast
+      - youtube: готовый клиент API; если не передан, берётся общий
+        клиент процесса из yt_auth.get_youtube_client
+      - batch: если передан yt_batch.YouTubeBatch, добавления в плейлисты
+        не выполняются сразу, а ставятся в очередь с ключом
+        (broadcast_id, alias); вызывающий код выполняет batch.execute()
+      - thumbnail_bytes: JPEG обложки в памяти (только что сгенерированной);
+        если задан, загружается вместо файла thumbnail_path
 
     Возвращает dict:
       {
@@ -232,8 +275,13 @@ def schedule_stream(
         "stream_key":   ...,
       }
     """
-    # YouTube API клиент
-    youtube = get_youtube_service(SCOPES)
+    # YouTube API клиент (один на процесс, не пересоздаётся для каждого дня)
+    if youtube is None:
+        youtube = get_youtube_client(SCOPES)
+    if youtube is None:
+        raise RuntimeError(
+            "YouTube клиент не создан: refresh token отозван, нужна повторная авторизация."
+        )
 
     print("→ Создаём liveBroadcast…")
     broadcast = create_live_broadcast(
@@ -273,38 +321,31 @@ def schedule_stream(
         youtube=youtube,
         broadcast_id=broadcast_id,
         thumbnail_path=thumbnail_path,
+        thumbnail_bytes=thumbnail_bytes,
     )
 
     # Получаем RTMP URL и ключ выбранного потока
     print("→ Получаем данные потока…")
-    stream_resp = youtube.liveStreams().list(
-        part="cdn",
-        id=stream_id,
-    ).execute()
-
-    items = stream_resp.get("items", [])
-    if not items:
-        raise RuntimeError(
-            f"Не найден liveStream с id={stream_id}. "
-            "Проверь, что ты указал корректный stream id."
-        )
-
-    ingestion = items[0]["cdn"]["ingestionInfo"]
-    rtmp_url = ingestion["ingestionAddress"]
-    stream_key = ingestion["streamName"]
+    rtmp_url, stream_key = get_stream_ingestion(youtube, stream_id)
 
     # Добавляем в плейлисты
     if playlist_ids:
         for pid, alias in playlist_ids:
-            print(f"→ Добавляем в плейлист: {alias}…")
             # ВАЖНО: в плейлист добавляем именно broadcast_id (видео),
             # как в твоём рабочем варианте
-            add_video_to_playlist(
+            request = build_playlist_insert(
                 youtube=youtube,
                 playlist_id=pid,
                 video_id=broadcast_id,
             )
-        print("→ Добавление в плейлисты завершено.")
+            if batch is not None:
+                print(f"→ В очередь batch: плейлист {alias}…")
+                batch.add((broadcast_id, alias), request)
+            else:
+                print(f"→ Добавляем в плейлист: {alias}…")
+                request.execute()
+        if batch is None:
+            print("→ Добавление в плейлисты завершено.")
     else:
         print("Плейлисты не заданы, пропускаю добавление.")
 